@@ -1,6 +1,12 @@
-from . import chat, chat_session
+from . import chat, chat_session, recursive_search, system
 from fastapi import APIRouter
 
 api_router = APIRouter()
+api_router.include_router(system.router, tags=["system"])
 api_router.include_router(chat.router, prefix="/chat", tags=["chat"])
 api_router.include_router(chat_session.router, prefix="/chat_session", tags=["chat_session"])
+api_router.include_router(recursive_search.router)
+
+__all__ = [
+    "api_router",
+]
@@ -1,24 +1,112 @@
-import os
-import json
-import tempfile
+import orjson
 import uuid6
 
-from fastapi.responses import StreamingResponse
-from fastapi import APIRouter, UploadFile, HTTPException, Depends
+from typing import Optional
+
+from fastapi.responses import Response, StreamingResponse
+from fastapi import APIRouter, UploadFile, HTTPException, Depends, Header
 from fastapi.params import Form, File
 import logging
 
-from app.services.chat_info import ChatMessageService, get_chat_message_service
-from app.utils.response import success_response
+from app.services.chat_info import (
+    ChatMessageService,
+    get_chat_message_service,
+    get_chat_message_service_ro,
+)
+from app.utils.constants import EventType
 from app.core.langchain import langchain_manager
+from app.core.config import config
+from app.core.dependencies import get_vectorstore
+from app.services.ai.query_cache import query_cache
+from app.services.upload_jobs import upload_job_manager
 from langchain_postgres import PGVector
-from langchain_core.documents import Document
 
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
 
+async def _embed_question(question: str):
+    """计算问题的 embedding，用于语义缓存；失败时返回 None"""
+    if not config.QUERY_CACHE_ENABLED:
+        return None
+    embeddings = langchain_manager.get_base_embeddings()
+    if not embeddings:
+        return None
+    try:
+        return await embeddings.aembed_query(question)
+    except Exception as e:
+        logger.warning(f"问题向量化失败，跳过语义缓存: {e}")
+        return None
+
+
+async def _prefetch_until_answer(events):
+    """
+    预取事件直到第一个回答片段（或事件流结束）
+
+    会话查询、消息写入和 Agent 启动阶段的失败都发生在这之前，
+    此时还没有发送响应头，调用方仍可以返回 500。
+    """
+    prefetched = []
+    async for event, data in events:
+        prefetched.append((event, data))
+        if event == EventType.MESSAGE:
+            break
+    return prefetched
+
+
+async def _ask_stream(events, prefetched, question: str, question_embedding, db):
+    """
+    边生成边输出 /ask 的 JSON 响应
+
+    先输出信封开头和 answer 字段的左引号，随后每个回答片段转义后直接写出，
+    最后补上 sources 等字段。success 放在最后：响应头发出后无法再改状态码，
+    中途出错时 success 为 false，并写入 error 字段，同时回滚本次请求的会话，
+    不提交用户消息和未完成的回答占位。
+    """
+    yield b'{"question":' + orjson.dumps(question) + b',"answer":"'
+
+    answer_parts = []
+    sources = []
+    error = None
+
+    async def _replay():
+        for item in prefetched:
+            yield item
+        async for item in events:
+            yield item
+
+    try:
+        # 直接消费事件流，不再经过 SSE 序列化再解析
+        async for event, data in _replay():
+            if event == EventType.MESSAGE:
+                answer_parts.append(data["content"])
+                # 去掉 JSON 字符串两侧的引号，只保留转义后的内容
+                yield orjson.dumps(data["content"])[1:-1]
+            elif event == EventType.RETRIEVAL:
+                sources.append(data)
+    except Exception as e:
+        logger.error(f"/ask 失败: {e}")
+        error = str(e)
+        try:
+            await db.rollback()
+        except Exception as rollback_error:
+            logger.error(f"/ask 回滚失败: {rollback_error}")
+    finally:
+        # 客户端断开时停止 Agent 事件流
+        await events.aclose()
+
+    full_answer = "".join(answer_parts)
+    if error is None and question_embedding is not None and full_answer:
+        query_cache.add(question_embedding, {"answer": full_answer, "sources": sources})
+
+    yield (
+        b'","sources":' + orjson.dumps(sources)
+        + b',"rag_used":true,"response_time":0,"error":' + orjson.dumps(error)
+        + b',"cached":false,"success":' + orjson.dumps(error is None) + b'}'
+    )
+
+
 @router.post("/ask")
 async def ask_question(
         question: str = Form(...),
@@ -27,31 +115,33 @@ async def ask_question(
 ):
     """问答接口"""
     try:
-        session_code = f"temp_{uuid6.uuid7()}"
-
-        full_answer = ""
-        sources = []
-
-        async for chunk in chat_message_service.chat(session_code, question):
-            if chunk.startswith("data: "):
-                try:
-                    data = json.loads(chunk[6:])
-                    if data.get("event") == "message":
-                        full_answer += data["data"]["content"]
-                    elif data.get("event") == "retrieval":
-                        sources.append(data["data"])
-                except:
-                    pass
+        question_embedding = await _embed_question(question)
+        if question_embedding is not None:
+            cached = query_cache.lookup(question_embedding)
+            if cached:
+                return {
+                    "success": True,
+                    "question": question,
+                    "answer": cached["answer"],
+                    "sources": cached["sources"],
+                    "rag_used": True,
+                    "response_time": 0,
+                    "error": None,
+                    "cached": True,
+                }
 
-        return {
-            "success": True,
-            "question": question,
-            "answer": full_answer,
-            "sources": sources,
-            "rag_used": True,
-            "response_time": 0,
-            "error": None
-        }
+        session_code = f"temp_{uuid6.uuid7()}"
+        events = chat_message_service.chat_events(session_code, question)
+        prefetched = await _prefetch_until_answer(events)
+
+        return StreamingResponse(
+            _ask_stream(
+                events, prefetched, question, question_embedding, chat_message_service.db
+            ),
+            media_type="application/json",
+            # 带 Content-Encoding 的响应 GZipMiddleware 会原样放行，避免压缩缓冲拖慢首字节
+            headers={"Content-Encoding": "identity"},
+        )
 
     except Exception as e:
         logger.error(f"/ask 失败: {e}")
@@ -61,54 +151,38 @@ async def ask_question(
 @router.post("/upload")
 async def upload_document(
         file: UploadFile = File(...),
+        vectorstore: PGVector = Depends(get_vectorstore),
 ):
-    """文档上传接口"""
-    tmp_path = None
+    """文档上传接口：文件入队后立即返回 job_id，切分和入库在后台完成"""
     try:
-        vectorstore = langchain_manager.get_vectorstore()
-        if not vectorstore:
-            raise HTTPException(status_code=500, detail="向量存储未初始化")
-        
-        content = await file.read()
-        suffix = os.path.splitext(file.filename)[1]
-        with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
-            tmp.write(content)
-            tmp_path = tmp.name
-
-        text_content = content.decode('utf-8')
-
-        # 简单分块
-        chunk_size = 1000
-        chunks = [text_content[i:i + chunk_size] for i in range(0, len(text_content), chunk_size)]
-
-        docs = [
-            Document(
-                page_content=chunk,
-                metadata={
-                    "filename": file.filename,
-                    "file_type": file.content_type,
-                    "chunk_index": i
-                }
-            )
-            for i, chunk in enumerate(chunks)
-        ]
-
-        # 单表存储
-        ids = await vectorstore.aadd_documents(docs)
-
+        job = await upload_job_manager.submit(file, vectorstore)
         return {
             "success": True,
-            "filename": file.filename,
-            "document_ids": ids,
-            "chunks": len(ids)
+            "job_id": job["job_id"],
+            "status": job["status"],
+            "filename": job["filename"],
         }
 
     except Exception as e:
         logger.error(f"上传失败: {e}")
         raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        if tmp_path and os.path.exists(tmp_path):
-            os.unlink(tmp_path)
+
+
+@router.get("/upload/{job_id}")
+async def get_upload_status(job_id: str):
+    """查询上传任务进度"""
+    job = upload_job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="上传任务不存在")
+    return {
+        "success": True,
+        "job_id": job["job_id"],
+        "status": job["status"],
+        "filename": job["filename"],
+        "chunks": job["chunks_done"],
+        "document_ids": job["document_ids"],
+        "error": job["error"],
+    }
 
 
 @router.post("/completion")
@@ -127,10 +201,18 @@ async def completion(
 @router.get("/history_messages")
 async def get_history_messages(
         chatSessionCode: str,
-        chat_message_service: ChatMessageService = Depends(get_chat_message_service),
+        if_none_match: Optional[str] = Header(None),
+        chat_message_service: ChatMessageService = Depends(get_chat_message_service_ro),
 ):
-    """获取历史消息"""
-    return success_response(
-        "获取历史消息成功",
-        await chat_message_service.get_history_message(chatSessionCode),
+    """获取历史消息（带 ETag，未变化时返回 304）"""
+    chat_session, etag = await chat_message_service.get_history_version(chatSessionCode)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+
+    if if_none_match and etag in (tag.strip() for tag in if_none_match.split(",")):
+        return Response(status_code=304, headers=headers)
+
+    return StreamingResponse(
+        chat_message_service.stream_history_message(chat_session),
+        media_type="application/json",
+        headers=headers,
     )
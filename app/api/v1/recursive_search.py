@@ -3,16 +3,77 @@
 集成到 FastAPI 路由中，支持 REST 调用
 """
 
-from fastapi import APIRouter, Form, HTTPException, Depends, Query
+from fastapi import APIRouter, Form, HTTPException, Depends, Query, Response
+from fastapi.responses import ORJSONResponse
 from typing import Optional
 import logging
+import orjson
 from app.services.retriever import RecursiveRetriever
 from app.services.retriever.config import RecursiveRetrieverPresets
-from app.core.langchain import langchain_manager
+from app.core.dependencies import get_vectorstore
 
 router = APIRouter(tags=["recursive-retrieval"])
 logger = logging.getLogger(__name__)
 
+# 预设名 -> 配置工厂（每次请求仍新建配置对象，因为会按请求修改 enable_logging）
+_PRESET_FACTORIES = {
+    "light": RecursiveRetrieverPresets.light,
+    "balanced": RecursiveRetrieverPresets.balanced,
+    "deep": RecursiveRetrieverPresets.deep,
+    "single_layer": RecursiveRetrieverPresets.single_layer,
+}
+
+# 预设列表是静态内容，启动时序列化一次，请求时直接返回字节
+_PRESETS_JSON = orjson.dumps({
+    "presets": [
+        {
+            "name": "light",
+            "description": "Fast, shallow retrieval",
+            "max_depth": 2,
+            "initial_k": 5,
+            "intermediate_k": 3,
+            "final_k": 3,
+            "num_sub_questions": 1,
+            "estimated_time": "~1s",
+            "accuracy": "⭐⭐",
+            "best_for": "Real-time queries, simple questions"
+        },
+        {
+            "name": "balanced",
+            "description": "Recommended balanced approach",
+            "max_depth": 3,
+            "initial_k": 10,
+            "intermediate_k": 5,
+            "final_k": 5,
+            "num_sub_questions": 2,
+            "estimated_time": "~2-3s",
+            "accuracy": "⭐⭐⭐⭐",
+            "best_for": "General questions, daily use"
+        },
+        {
+            "name": "deep",
+            "description": "Deep exploration retrieval",
+            "max_depth": 4,
+            "initial_k": 15,
+            "intermediate_k": 8,
+            "final_k": 5,
+            "num_sub_questions": 3,
+            "estimated_time": "~4-6s",
+            "accuracy": "⭐⭐⭐⭐⭐",
+            "best_for": "Complex questions, research"
+        },
+        {
+            "name": "single_layer",
+            "description": "Single layer retrieval only",
+            "max_depth": 1,
+            "initial_k": 5,
+            "estimated_time": "~0.8s",
+            "accuracy": "⭐⭐",
+            "best_for": "Testing, disabling recursion"
+        }
+    ]
+})
+
 
 @router.post("/recursive-search")
 async def recursive_search(
@@ -20,13 +81,14 @@ async def recursive_search(
     topic: Optional[str] = Form(None),
     preset: str = Form("balanced"),
     enable_logging: bool = Form(True),
+    vectorstore=Depends(get_vectorstore),
 ):
     """
     执行递归检索
     
     请求参数：
     - query: 搜索查询（必需）
-    - topic: 主题/表名（可选，如 vectorstore_resource）
+    - topic: 主题/表名（可选，单表模式下已忽略）
     - preset: 预设配置（light/balanced/deep/single_layer，默认 balanced）
     - enable_logging: 是否启用日志（默认 true）
     
@@ -55,31 +117,23 @@ async def recursive_search(
     """
     try:
         # 选择预设
-        presets = {
-            "light": RecursiveRetrieverPresets.light,
-            "balanced": RecursiveRetrieverPresets.balanced,
-            "deep": RecursiveRetrieverPresets.deep,
-            "single_layer": RecursiveRetrieverPresets.single_layer,
-        }
-        
-        if preset not in presets:
+        factory = _PRESET_FACTORIES.get(preset)
+        if factory is None:
             raise HTTPException(status_code=400, detail=f"Unknown preset: {preset}")
         
-        config = presets[preset]()
+        config = factory()
         config.enable_logging = enable_logging
         
         # 创建检索器
-        vectorstore = langchain_manager.get_vectorstore()
         retriever = RecursiveRetriever(config=config, vectorstore=vectorstore)
         
         # 执行检索
         results, report = await retriever.retrieve(
             query=query,
-            topic=topic,
             return_report=True,
         )
         
-        return {
+        return ORJSONResponse({
             "success": True,
             "results": results,
             "report": {
@@ -90,7 +144,7 @@ async def recursive_search(
                 "merge_info": report.merge_info,
                 "retrieval_tree": report.retrieval_tree,
             }
-        }
+        })
     
     except Exception as e:
         logger.error(f"递归检索失败: {e}")
@@ -118,55 +172,7 @@ async def list_presets():
     }
     ```
     """
-    return {
-        "presets": [
-            {
-                "name": "light",
-                "description": "Fast, shallow retrieval",
-                "max_depth": 2,
-                "initial_k": 5,
-                "intermediate_k": 3,
-                "final_k": 3,
-                "num_sub_questions": 1,
-                "estimated_time": "~1s",
-                "accuracy": "⭐⭐",
-                "best_for": "Real-time queries, simple questions"
-            },
-            {
-                "name": "balanced",
-                "description": "Recommended balanced approach",
-                "max_depth": 3,
-                "initial_k": 10,
-                "intermediate_k": 5,
-                "final_k": 5,
-                "num_sub_questions": 2,
-                "estimated_time": "~2-3s",
-                "accuracy": "⭐⭐⭐⭐",
-                "best_for": "General questions, daily use"
-            },
-            {
-                "name": "deep",
-                "description": "Deep exploration retrieval",
-                "max_depth": 4,
-                "initial_k": 15,
-                "intermediate_k": 8,
-                "final_k": 5,
-                "num_sub_questions": 3,
-                "estimated_time": "~4-6s",
-                "accuracy": "⭐⭐⭐⭐⭐",
-                "best_for": "Complex questions, research"
-            },
-            {
-                "name": "single_layer",
-                "description": "Single layer retrieval only",
-                "max_depth": 1,
-                "initial_k": 5,
-                "estimated_time": "~0.8s",
-                "accuracy": "⭐⭐",
-                "best_for": "Testing, disabling recursion"
-            }
-        ]
-    }
+    return Response(content=_PRESETS_JSON, media_type="application/json")
 
 
 @router.post("/recursive-search/custom")
@@ -181,6 +187,7 @@ async def recursive_search_custom(
     num_sub_questions: int = Form(2),
     rerank_method: str = Form("cosine"),
     deduplication_threshold: float = Form(0.85),
+    vectorstore=Depends(get_vectorstore),
 ):
     """
     使用自定义配置执行递归检索
@@ -214,17 +221,15 @@ async def recursive_search_custom(
         )
         
         # 创建检索器
-        vectorstore = langchain_manager.get_vectorstore()
         retriever = RecursiveRetriever(config=config, vectorstore=vectorstore)
         
         # 执行检索
         results, report = await retriever.retrieve(
             query=query,
-            topic=topic,
             return_report=True,
         )
         
-        return {
+        return ORJSONResponse({
             "success": True,
             "config_used": {
                 "max_depth": max_depth,
@@ -241,7 +246,7 @@ async def recursive_search_custom(
                 "merge_info": report.merge_info,
                 "retrieval_tree": report.retrieval_tree,
             }
-        }
+        })
     
     except Exception as e:
         logger.error(f"自定义递归检索失败: {e}")
@@ -1,6 +1,8 @@
 from fastapi import APIRouter, HTTPException
 import logging
 
+from app.core.db import async_db_manager
+
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
@@ -20,11 +22,13 @@ async def root():
 
 @router.get("/health")
 async def health_check():
+    # 只做 SELECT 1 探活，不做任何统计聚合
+    db_ok = await async_db_manager.ping()
     return {
-        "status": "healthy",
+        "status": "healthy" if db_ok else "degraded",
         "services": {
             "ai": "operational",
-            "database": "operational",
+            "database": "operational" if db_ok else "unavailable",
         }
     }
 
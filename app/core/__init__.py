@@ -4,6 +4,7 @@ from . import lifespan
 from . import logging
 from . import db
 from . import langchain
+from . import http
 
 
 __all__ = [
@@ -13,4 +14,5 @@ __all__ = [
     "logging",
     "db",
     "langchain",
+    "http",
 ]
\ No newline at end of file
@@ -1,9 +1,12 @@
 import os
+from dataclasses import dataclass
 from dotenv import load_dotenv
 
 load_dotenv()
 
 
+# 环境变量在导入时读取一次；实例只读，属性存放在 __slots__ 中
+@dataclass(frozen=True, slots=True)
 class Config:
 
     # 数据库配置（从 .env 读取）
@@ -31,16 +34,75 @@ class Config:
     RERANKER_MODEL: str = os.getenv("RERANKER_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
     RERANKER_DEVICE: str = os.getenv("RERANKER_DEVICE", "cpu")
     RERANKER_BATCH_SIZE: int = int(os.getenv("RERANKER_BATCH_SIZE", "32"))
+    # 向量检索第一名与第二名的余弦距离差超过该值时跳过重排
+    RERANK_SKIP_DISTANCE_GAP: float = float(os.getenv("RERANK_SKIP_DISTANCE_GAP", "0.15"))
+
+    # HTTP 连接池配置（DashScope 等外部 API）
+    HTTP_POOL_LIMIT: int = 100
+    HTTP_POOL_LIMIT_PER_HOST: int = 32
+    HTTP_KEEPALIVE_TIMEOUT: int = 75
+
+    # Deep Search 对冲请求延迟（毫秒），超过后并行发起 Bailian App 请求
+    DEEP_SEARCH_HEDGE_DELAY_MS: int = int(os.getenv("DEEP_SEARCH_HEDGE_DELAY_MS", "400"))
+
+    # Embedding 缓存与批量配置
+    EMBEDDING_CACHE_SIZE: int = int(os.getenv("EMBEDDING_CACHE_SIZE", "50000"))
+    EMBEDDING_BATCH_SIZE: int = int(os.getenv("EMBEDDING_BATCH_SIZE", "10"))
+    EMBEDDING_BATCH_WAIT_MS: float = float(os.getenv("EMBEDDING_BATCH_WAIT_MS", "5"))
+    # LangChain embedding 模型（Ollama）的缓存
+    BASE_EMBEDDING_CACHE_SIZE: int = int(os.getenv("BASE_EMBEDDING_CACHE_SIZE", "10000"))
+    BASE_EMBEDDING_CACHE_TTL: int = int(os.getenv("BASE_EMBEDDING_CACHE_TTL", "1800"))
+
+    # 语义查询缓存配置（/ask）
+    QUERY_CACHE_ENABLED: bool = os.getenv("QUERY_CACHE_ENABLED", "true").lower() == "true"
+    QUERY_CACHE_SIZE: int = int(os.getenv("QUERY_CACHE_SIZE", "4096"))
+    QUERY_CACHE_THRESHOLD: float = float(os.getenv("QUERY_CACHE_THRESHOLD", "0.92"))
+    QUERY_CACHE_TTL: int = int(os.getenv("QUERY_CACHE_TTL", "3600"))
+
+    # 智能体检索结果缓存（retrieve_documents）
+    RETRIEVAL_CACHE_SIZE: int = int(os.getenv("RETRIEVAL_CACHE_SIZE", "512"))
+    RETRIEVAL_CACHE_TTL: int = int(os.getenv("RETRIEVAL_CACHE_TTL", "60"))
+    # 每个检索片段返回给智能体的最大字符数
+    RETRIEVAL_CONTENT_MAX_CHARS: int = int(os.getenv("RETRIEVAL_CONTENT_MAX_CHARS", "800"))
+
+    # 后台上传任务 worker 数
+    UPLOAD_WORKERS: int = int(os.getenv("UPLOAD_WORKERS", "2"))
+
+    # 向量库（PGVector）连接池配置
+    VECTOR_POOL_MIN_SIZE: int = int(os.getenv("VECTOR_POOL_MIN_SIZE", "10"))
+    VECTOR_POOL_MAX_SIZE: int = int(os.getenv("VECTOR_POOL_MAX_SIZE", "50"))
+
+    # 向量库 HNSW 索引配置（pgvector）
+    HNSW_M: int = int(os.getenv("HNSW_M", "16"))
+    HNSW_EF_CONSTRUCTION: int = int(os.getenv("HNSW_EF_CONSTRUCTION", "64"))
+    HNSW_EF_SEARCH: int = int(os.getenv("HNSW_EF_SEARCH", "40"))
+    # 建索引时的内存与并行度（仅作用于建索引的会话）
+    INDEX_MAINTENANCE_WORK_MEM: str = os.getenv("INDEX_MAINTENANCE_WORK_MEM", "1GB")
+    INDEX_MAINTENANCE_WORKERS: int = int(os.getenv("INDEX_MAINTENANCE_WORKERS", "4"))
+    # 启动时把 HNSW 索引预读进 shared_buffers（需要 pg_prewarm 扩展）
+    PREWARM_VECTOR_INDEX: bool = os.getenv("PREWARM_VECTOR_INDEX", "true").lower() == "true"
 
     DB_POOL_MIN_SIZE: int = 2
     DB_POOL_MAX_SIZE: int = 10
-    VECTOR_DIMENSION: int = 768
+    # 连接最长复用时间（秒），超过后重建，避免被服务端或中间代理静默断开
+    DB_POOL_RECYCLE: int = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+    # 是否输出每条 SQL（仅排查问题时开启）
+    SQL_ECHO: bool = os.getenv("SQL_ECHO", "false").lower() == "true"
+    # 慢查询日志阈值（毫秒），0 表示关闭
+    SLOW_QUERY_MS: int = int(os.getenv("SLOW_QUERY_MS", "200"))
+    # 向量维度，必须与 EMBEDDING 模型输出一致（建表、HNSW 索引和启动预热都依赖它）
+    VECTOR_DIMENSION: int = int(os.getenv("VECTOR_DIMENSION", "768"))
     VECTOR_INDEX_LISTS: int = 100
     AUTO_CREATE_INDEX: bool = True
     SKIP_INDEX_CREATION: bool = False
     LOG_LEVEL: str = "DEBUG"
     LOG_FORMAT: str = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
     LOG_FILE_NAME: str = "logs/app.log"
+    # 日志文件按大小轮转，保留的历史文件数
+    LOG_FILE_MAX_BYTES: int = 64 * 1024 * 1024
+    LOG_FILE_BACKUP_COUNT: int = 10
+    # 文件日志先缓冲到内存，攒够条数或遇到 ERROR 时再一次写出
+    LOG_BUFFER_CAPACITY: int = 1024
     DEBUG: bool = True
 
 
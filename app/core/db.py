@@ -1,3 +1,4 @@
+import asyncio
 import asyncpg
 from psycopg_pool import AsyncConnectionPool
 from sqlalchemy.ext.asyncio import (
@@ -6,15 +7,34 @@ from sqlalchemy.ext.asyncio import (
     create_async_engine,
     AsyncEngine,
 )
-from sqlalchemy import text
+from sqlalchemy import event, text
 from typing import Optional, AsyncGenerator
 from contextlib import asynccontextmanager
 from app.core.config import config
 import logging
+import time
 
 logger = logging.getLogger(__name__)
 
 
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed_ms = (time.perf_counter() - conn.info["query_start_time"].pop()) * 1000
+    if elapsed_ms >= config.SLOW_QUERY_MS:
+        logger.warning(f"Slow query ({elapsed_ms:.1f} ms): {statement}")
+
+
+def enable_slow_query_log(engine: AsyncEngine):
+    """只记录耗时超过 SLOW_QUERY_MS 的语句，代替逐条 echo"""
+    if config.SLOW_QUERY_MS <= 0:
+        return
+    event.listen(engine.sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine.sync_engine, "after_cursor_execute", _after_cursor_execute)
+
+
 class AsyncDatabaseManager:
     def __init__(self):
         self.async_engine: Optional[AsyncEngine] = None
@@ -34,11 +54,15 @@ class AsyncDatabaseManager:
         # 创建异步引擎
         self.async_engine = create_async_engine(
             database_url,
-            echo=config.DEBUG,
+            echo=config.SQL_ECHO,
             pool_size=config.DB_POOL_MIN_SIZE,
             max_overflow=config.DB_POOL_MAX_SIZE - config.DB_POOL_MIN_SIZE,
             pool_pre_ping=True,
+            pool_recycle=config.DB_POOL_RECYCLE,
+            # 优先复用最近归还的连接，空闲连接可按 pool_recycle 自然淘汰
+            pool_use_lifo=True,
         )
+        enable_slow_query_log(self.async_engine)
 
         # 测试连接
         try:
@@ -62,6 +86,19 @@ class AsyncDatabaseManager:
         self._initialized = True
         logger.info("Async database initialized successfully.")
 
+    async def ping(self, timeout: float = 1.0) -> bool:
+        """健康检查：执行一次 SELECT 1，超时或失败返回 False"""
+        if not self._initialized:
+            return False
+        try:
+            async with asyncio.timeout(timeout):
+                async with self.async_engine.connect() as conn:
+                    await conn.execute(text("SELECT 1"))
+            return True
+        except Exception as e:
+            logger.warning(f"Database ping failed: {e}")
+            return False
+
     async def close(self):
         """关闭异步数据库引擎和连接池"""
         if self.async_engine:
@@ -88,6 +125,16 @@ class AsyncDatabaseManager:
             finally:
                 await session.close()
 
+    @asynccontextmanager
+    async def get_async_db_ro(self) -> AsyncGenerator[AsyncSession, None]:
+        """获取只读会话：事务声明为 READ ONLY，结束时直接回滚，不再提交"""
+        if not self._initialized:
+            await self.init_async_database()
+
+        async with self._async_session() as session:
+            await session.execute(text("SET TRANSACTION READ ONLY"))
+            yield session
+
 
 # 创建全局唯一实例
 async_db_manager = AsyncDatabaseManager()
@@ -121,7 +168,7 @@ class LangchainConnectionPool:
             max_idle=300,
             kwargs={
                 "application_name": "langchain_rag",
-                "options": "-c statement_timeout=30000",
+                "options": "-c statement_timeout=30000 -c jit=off",
             }
         )
 
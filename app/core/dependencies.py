@@ -1,7 +1,23 @@
+from fastapi import HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.core.db import async_db_manager
+from app.core.langchain import langchain_manager
 
 async def get_db() -> AsyncSession:
     """统一数据库会话依赖"""
     async with async_db_manager.get_async_db() as session:
-        yield session
\ No newline at end of file
+        yield session
+
+
+async def get_db_ro() -> AsyncSession:
+    """只读数据库会话依赖（查询类接口使用，省去提交的往返）"""
+    async with async_db_manager.get_async_db_ro() as session:
+        yield session
+
+
+def get_vectorstore():
+    """向量存储依赖（单表，进程内共享同一实例及其连接池）"""
+    vectorstore = langchain_manager.get_vectorstore()
+    if not vectorstore:
+        raise HTTPException(status_code=500, detail="向量存储未初始化")
+    return vectorstore
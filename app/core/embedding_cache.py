@@ -0,0 +1,156 @@
+import asyncio
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingCache:
+    """
+    按内容寻址的 embedding 缓存（LRU + 可选 TTL），key = hash(模型名 + 类型 + 文本)
+
+    部分模型对查询和文档加不同的指令前缀，同一文本两种用法的向量不同，
+    因此 kind（"query" / "doc"）也是 key 的一部分。
+    """
+
+    def __init__(self, maxsize: int = 50000, ttl: Optional[float] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._cache: "OrderedDict[bytes, Tuple[np.ndarray, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(model: str, text: str, kind: str = "") -> bytes:
+        return hashlib.blake2b(
+            model.encode() + b"\0" + kind.encode() + b"\0" + text.encode(),
+            digest_size=16,
+        ).digest()
+
+    def get(self, key: bytes) -> Optional[np.ndarray]:
+        with self._lock:
+            item = self._cache.get(key)
+            if item is None:
+                return None
+            vector, created_at = item
+            if self.ttl is not None and time.monotonic() - created_at > self.ttl:
+                del self._cache[key]
+                return None
+            self._cache.move_to_end(key)
+            return vector
+
+    def set(self, key: bytes, embedding: np.ndarray) -> np.ndarray:
+        # 以 float32 存储，内存占用减半；设为只读，命中时可直接返回同一数组
+        vector = np.asarray(embedding, dtype=np.float32)
+        vector.flags.writeable = False
+        with self._lock:
+            self._cache[key] = (vector, time.monotonic())
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.maxsize:
+                self._cache.popitem(last=False)
+        return vector
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+    def __len__(self):
+        return len(self._cache)
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    给 LangChain Embeddings 加一层缓存
+
+    批量调用时只把未命中的文本（去重后）交给底层模型，再按原顺序合并结果。
+    并发的相同查询只请求一次模型，其余调用等待同一个结果。
+    """
+
+    def __init__(self, embeddings: Embeddings, model: str, cache: EmbeddingCache):
+        self.embeddings = embeddings
+        self.model = model
+        self.cache = cache
+        self._inflight: Dict[bytes, asyncio.Future] = {}
+
+    def _lookup(self, texts: List[str]):
+        results: List[Optional[List[float]]] = [None] * len(texts)
+        missing: "OrderedDict[bytes, List[int]]" = OrderedDict()
+        missing_texts: List[str] = []
+
+        for i, text in enumerate(texts):
+            key = self.cache.make_key(self.model, text, "doc")
+            cached = self.cache.get(key)
+            if cached is not None:
+                results[i] = cached.tolist()
+            elif key in missing:
+                missing[key].append(i)
+            else:
+                missing[key] = [i]
+                missing_texts.append(text)
+        return results, missing, missing_texts
+
+    def _merge(self, results, missing, embeddings: List[List[float]]) -> List[List[float]]:
+        for key, embedding in zip(missing.keys(), embeddings):
+            self.cache.set(key, embedding)
+            for i in missing[key]:
+                results[i] = embedding
+        return results
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        results, missing, missing_texts = self._lookup(texts)
+        if missing_texts:
+            results = self._merge(
+                results, missing, self.embeddings.embed_documents(missing_texts)
+            )
+        return results
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        results, missing, missing_texts = self._lookup(texts)
+        if missing_texts:
+            results = self._merge(
+                results, missing, await self.embeddings.aembed_documents(missing_texts)
+            )
+        logger.debug(
+            f"Embedded {len(texts)} texts ({len(texts) - len(missing_texts)} cache hits)"
+        )
+        return results
+
+    def embed_query(self, text: str) -> List[float]:
+        key = self.cache.make_key(self.model, text, "query")
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached.tolist()
+        embedding = self.embeddings.embed_query(text)
+        self.cache.set(key, embedding)
+        return embedding
+
+    async def aembed_query(self, text: str) -> List[float]:
+        key = self.cache.make_key(self.model, text, "query")
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached.tolist()
+
+        task = self._inflight.get(key)
+        if task is None:
+            # 模型请求放在独立任务中，发起方被取消时不会连带取消其他等待方
+            task = asyncio.ensure_future(self._embed_and_cache(key, text))
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._finish_inflight(key, t))
+
+        # shield：任一调用方被取消只影响它自己，请求照常完成并写入缓存
+        return (await asyncio.shield(task)).tolist()
+
+    async def _embed_and_cache(self, key: bytes, text: str) -> np.ndarray:
+        return self.cache.set(key, await self.embeddings.aembed_query(text))
+
+    def _finish_inflight(self, key: bytes, task: asyncio.Future):
+        self._inflight.pop(key, None)
+        # 所有调用方都已取消时也标记异常已读取，避免 "exception was never retrieved" 日志
+        if not task.cancelled():
+            task.exception()
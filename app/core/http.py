@@ -0,0 +1,58 @@
+import logging
+from functools import lru_cache
+from typing import Optional
+
+import httpx
+
+from app.core.config import config
+
+logger = logging.getLogger(__name__)
+
+
+@lru_cache(maxsize=1)
+def get_dashscope_headers() -> httpx.Headers:
+    """DashScope 请求头，进程内只构建一次，作为共享客户端的默认请求头"""
+    return httpx.Headers(
+        {
+            "Authorization": f"Bearer {config.DASHSCOPE_API_KEY}",
+            "Content-Type": "application/json",
+        }
+    )
+
+
+class HttpClientManager:
+    """
+    共享的 httpx 客户端管理
+
+    开启 HTTP/2，同一主机的并发请求在一条 TCP/TLS 连接上多路复用，
+    避免 HTTP/1.1 下每个并发请求各占一条连接。
+    """
+
+    def __init__(self):
+        self._client: Optional[httpx.AsyncClient] = None
+
+    def get_client(self) -> httpx.AsyncClient:
+        """获取客户端实例，首次使用时创建"""
+        if self._client is None or self._client.is_closed:
+            logger.info("Creating shared httpx client (HTTP/2)...")
+            self._client = httpx.AsyncClient(
+                http2=True,
+                headers=get_dashscope_headers(),
+                limits=httpx.Limits(
+                    max_connections=config.HTTP_POOL_LIMIT,
+                    max_keepalive_connections=config.HTTP_POOL_LIMIT_PER_HOST,
+                    keepalive_expiry=config.HTTP_KEEPALIVE_TIMEOUT,
+                ),
+                timeout=httpx.Timeout(60.0),
+            )
+        return self._client
+
+    async def close(self):
+        """关闭客户端及其连接池"""
+        if self._client is not None and not self._client.is_closed:
+            logger.info("Closing shared httpx client...")
+            await self._client.aclose()
+        self._client = None
+
+
+http_client_manager = HttpClientManager()
@@ -3,8 +3,14 @@ LangChain 核心模块管理
 单表模式：所有文档存储到 ai_documents 表
 """
 from typing import Optional
+import asyncio
+import contextlib
 import logging
 
+import httpx
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+
 logger = logging.getLogger(__name__)
 
 # LangChain 0.1.x - 使用 langchain_openai
@@ -23,7 +29,8 @@ except ImportError:
     OllamaEmbeddings = None
 
 from app.core.config import config
-from app.core.db import db_initializer
+from app.core.db import db_initializer, enable_slow_query_log
+from app.core.embedding_cache import CachedEmbeddings, EmbeddingCache
 
 
 class SimpleLangchainManager:
@@ -33,23 +40,36 @@ class SimpleLangchainManager:
         self._chatModel = None
         self._embeddingModel = None
         self._vectorstore = None
+        self._vector_engine: Optional[AsyncEngine] = None
+        self._http_client: Optional[httpx.AsyncClient] = None
+        self._index_task: Optional[asyncio.Task] = None
         self._initialized = False
+        self._init_lock = asyncio.Lock()
 
     async def initialize(self):
-        """初始化 Langchain 组件"""
+        """初始化 Langchain 组件（并发调用时只执行一次）"""
         if self._initialized:
             return
 
-        logger.info("Initializing Langchain components...")
-        
-        # 确保数据库已初始化
-        await db_initializer.initialize()
-        
-        # 初始化模型
-        self._init_models()
-        
-        self._initialized = True
-        logger.info("✅ Langchain components initialized successfully")
+        async with self._init_lock:
+            if self._initialized:
+                return
+
+            logger.info("Initializing Langchain components...")
+
+            # 确保数据库已初始化
+            await db_initializer.initialize()
+
+            # 初始化模型
+            self._init_models()
+
+            # 预先创建向量存储及其连接池，避免首个请求承担建连开销
+            self.get_vectorstore()
+            # 大表上 CONCURRENTLY 建索引可能持续数分钟，放到后台执行，不阻塞应用启动
+            self._index_task = asyncio.create_task(self._prepare_vector_search())
+
+            self._initialized = True
+            logger.info("✅ Langchain components initialized successfully")
 
     def _init_models(self):
         """初始化模型"""
@@ -57,6 +77,16 @@ class SimpleLangchainManager:
         if ChatOpenAI and config.CHAT_MODEL_NAME:
             try:
                 logger.info(f"Connecting to chat model: {config.CHAT_MODEL_NAME}")
+                # 模型请求共用一个 HTTP/2 长连接池，并发调用多路复用同一连接
+                self._http_client = httpx.AsyncClient(
+                    http2=True,
+                    limits=httpx.Limits(
+                        max_connections=config.HTTP_POOL_LIMIT,
+                        max_keepalive_connections=config.HTTP_POOL_LIMIT_PER_HOST,
+                        keepalive_expiry=config.HTTP_KEEPALIVE_TIMEOUT,
+                    ),
+                    timeout=httpx.Timeout(60.0),
+                )
                 self._chatModel = ChatOpenAI(
                     model=config.CHAT_MODEL_NAME,
                     base_url=config.CHAT_MODEL_BASE_URL,
@@ -65,6 +95,7 @@ class SimpleLangchainManager:
                     max_tokens=2000,
                     request_timeout=60,
                     max_retries=3,
+                    http_async_client=self._http_client,
                 )
                 logger.info(f"✅ Chat model connected: {config.CHAT_MODEL_NAME}")
             except Exception as e:
@@ -75,9 +106,17 @@ class SimpleLangchainManager:
         if OllamaEmbeddings and config.BASE_EMBEDDING_MODEL_NAME:
             try:
                 logger.info(f"Connecting to embedding model: {config.BASE_EMBEDDING_MODEL_NAME}")
-                self._embeddingModel = OllamaEmbeddings(
+                # 重复的查询和文档分块直接命中缓存，不再请求模型
+                self._embeddingModel = CachedEmbeddings(
+                    OllamaEmbeddings(
+                        model=config.BASE_EMBEDDING_MODEL_NAME,
+                        base_url=config.BASE_EMBEDDING_MODEL_BASE_URL,
+                    ),
                     model=config.BASE_EMBEDDING_MODEL_NAME,
-                    base_url=config.BASE_EMBEDDING_MODEL_BASE_URL,
+                    cache=EmbeddingCache(
+                        maxsize=config.BASE_EMBEDDING_CACHE_SIZE,
+                        ttl=config.BASE_EMBEDDING_CACHE_TTL,
+                    ),
                 )
                 logger.info(f"✅ Embedding model connected: {config.BASE_EMBEDDING_MODEL_NAME}")
             except Exception as e:
@@ -116,11 +155,37 @@ class SimpleLangchainManager:
                 logger.error("❌ Embedding model not available")
                 return None
             
+            # 应用生命周期内共享的连接池，所有检索/写入复用已建立的连接
+            # 每个连接建立时设置 HNSW 检索的候选集大小，并关闭 JIT
+            # （向量检索的代价估算偏高，常触发 JIT 编译，反而多出数毫秒）
+            if "+asyncpg" in connection_string:
+                connect_args = {
+                    "statement_cache_size": 1024,
+                    "server_settings": {
+                        "hnsw.ef_search": str(config.HNSW_EF_SEARCH),
+                        "jit": "off",
+                    },
+                }
+            else:
+                connect_args = {
+                    "options": f"-c hnsw.ef_search={config.HNSW_EF_SEARCH} -c jit=off"
+                }
+            self._vector_engine = create_async_engine(
+                connection_string,
+                pool_size=config.VECTOR_POOL_MIN_SIZE,
+                max_overflow=config.VECTOR_POOL_MAX_SIZE - config.VECTOR_POOL_MIN_SIZE,
+                pool_pre_ping=True,
+                connect_args=connect_args,
+            )
+            enable_slow_query_log(self._vector_engine)
+
             # 单表：collection_name 固定为 ai_documents
             self._vectorstore = PGVector(
                 embeddings=embeddings,
-                connection=connection_string,
+                connection=self._vector_engine,
                 collection_name="ai_documents",
+                # 声明向量维度，embedding 列才能建立 HNSW 索引
+                embedding_length=config.VECTOR_DIMENSION,
                 async_mode=True,
             )
             
@@ -134,6 +199,114 @@ class SimpleLangchainManager:
             logger.error(f"❌ Failed to initialize vectorstore: {type(e).__name__}: {e}")
             return None
 
+    async def _prepare_vector_search(self):
+        """后台依次确保 HNSW 索引、预读索引并预热检索链路（各步骤自行处理异常）"""
+        await self.ensure_vector_index()
+        await self.prewarm_vector_index()
+        await self.warmup_vector_search()
+
+    async def ensure_vector_index(self):
+        """为 embedding 列创建 HNSW 索引（cosine），相似度检索不再全表扫描"""
+        if config.SKIP_INDEX_CREATION or not config.AUTO_CREATE_INDEX:
+            logger.info("Index creation skipped by configuration")
+            return
+        if self._vectorstore is None or self._vector_engine is None:
+            return
+
+        index_sql = (
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS langchain_pg_embedding_hnsw_idx "
+            "ON langchain_pg_embedding USING hnsw (embedding vector_cosine_ops) "
+            f"WITH (m = {config.HNSW_M}, ef_construction = {config.HNSW_EF_CONSTRUCTION})"
+        )
+        try:
+            await self._vectorstore.acreate_tables_if_not_exists()
+            async with self._vector_engine.connect() as conn:
+                # CONCURRENTLY 不能在事务中执行
+                conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+                # 中断或失败的 CONCURRENTLY 构建会留下 INVALID 索引，IF NOT EXISTS 会直接跳过它，
+                # 检索也永远用不上；先删掉再重建（其他进程正在构建中的除外）
+                invalid = await conn.scalar(text("""
+                    SELECT NOT i.indisvalid
+                       AND NOT EXISTS (
+                           SELECT 1 FROM pg_stat_progress_create_index p
+                           WHERE p.index_relid = i.indexrelid
+                       )
+                    FROM pg_index i
+                    WHERE i.indexrelid = to_regclass('langchain_pg_embedding_hnsw_idx')
+                """))
+                if invalid:
+                    logger.warning("Dropping invalid HNSW index left by an interrupted build")
+                    await conn.execute(
+                        text("DROP INDEX CONCURRENTLY IF EXISTS langchain_pg_embedding_hnsw_idx")
+                    )
+                await conn.execute(text(index_sql))
+            logger.info("✅ HNSW vector index ensured")
+        except Exception as e:
+            # 已有表的 embedding 列未声明维度时无法建索引，需要先手动修改列类型
+            logger.error(f"HNSW index creation failed: {e}")
+            logger.info("You can create it manually later with:")
+            logger.info(
+                f"  ALTER TABLE langchain_pg_embedding ALTER COLUMN embedding TYPE vector({config.VECTOR_DIMENSION});"
+            )
+            logger.info(f"  {index_sql};")
+
+    async def prewarm_vector_index(self):
+        """更新统计信息并预读 HNSW 索引，首个检索请求不再承担冷读磁盘的开销"""
+        if not config.PREWARM_VECTOR_INDEX or self._vector_engine is None:
+            return
+
+        try:
+            async with self._vector_engine.connect() as conn:
+                conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+                await conn.execute(text("ANALYZE langchain_pg_embedding"))
+                await conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_prewarm"))
+                result = await conn.execute(
+                    text("SELECT pg_prewarm('langchain_pg_embedding_hnsw_idx')")
+                )
+            logger.info(f"✅ HNSW vector index prewarmed ({result.scalar()} blocks)")
+        except Exception as e:
+            # 扩展不可用或索引尚未建立时跳过，不影响启动
+            logger.warning(f"Vector index prewarm skipped: {e}")
+
+    async def warmup_vector_search(self):
+        """
+        启动时执行一次向量检索（k=1），预热检索链路
+
+        首次检索需要加载 collection、编译 SQLAlchemy 语句并让连接上的
+        pgvector 完成首次规划，提前做掉可避免首个真实请求的延迟尖峰。
+        使用固定的单位向量，不调用 embedding 模型。
+        """
+        if self._vectorstore is None:
+            return
+
+        try:
+            probe = [0.0] * config.VECTOR_DIMENSION
+            probe[0] = 1.0
+            await self._vectorstore.asimilarity_search_by_vector(probe, k=1)
+            logger.info("✅ Vector search path warmed up")
+        except Exception as e:
+            logger.warning(f"Vector search warmup skipped: {e}")
+
+    async def close(self):
+        """释放模型 HTTP 客户端和向量存储的连接池"""
+        if self._index_task is not None:
+            # 中断的 CONCURRENTLY 构建会留下 INVALID 索引，下次启动时由 ensure_vector_index 重建
+            if not self._index_task.done():
+                logger.info("Cancelling vector index preparation...")
+                self._index_task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._index_task
+            self._index_task = None
+        if self._http_client is not None:
+            logger.info("Closing chat model http client...")
+            await self._http_client.aclose()
+            self._http_client = None
+        if self._vector_engine is not None:
+            logger.info("Closing vectorstore engine...")
+            await self._vector_engine.dispose()
+            self._vector_engine = None
+        self._vectorstore = None
+
     def get_checkpointer(self):
         """获取检查点器"""
         logger.warning("Checkpointer not available")
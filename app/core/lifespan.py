@@ -1,6 +1,8 @@
+import asyncio
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
 import logging
+import sys
 import time
 
 logger = logging.getLogger(__name__)
@@ -21,8 +23,11 @@ async def lifespan(app: FastAPI):
         from app.core.db import async_db_manager, langchain_pool
 
         logger.info("Step 1/3: Initializing database connections...")
-        await async_db_manager.init_async_database()
-        await langchain_pool.connect()
+        # 两个连接池互不依赖，并发建立连接以缩短启动时间
+        await asyncio.gather(
+            async_db_manager.init_async_database(),
+            langchain_pool.connect(),
+        )
 
         # 2. 初始化 Langchain 组件（包括数据库表创建）
         from app.core.langchain import langchain_manager
@@ -30,6 +35,12 @@ async def lifespan(app: FastAPI):
         logger.info("Step 2/3: Initializing Langchain components...")
         await langchain_manager.initialize()
 
+        # 3. 启动后台上传任务 worker
+        from app.services.upload_jobs import upload_job_manager
+
+        logger.info("Step 3/3: Starting upload workers...")
+        upload_job_manager.start()
+
         elapsed = time.time() - start_time
         logger.info("=" * 60)
         logger.info(f"✅ Server started successfully in {elapsed:.2f}s")
@@ -49,8 +60,21 @@ async def lifespan(app: FastAPI):
     logger.info("=" * 60)
 
     from app.core.db import langchain_pool as lp, async_db_manager as adm
+    from app.core.http import http_client_manager
+    from app.core.langchain import langchain_manager
+    from app.core.logging import stop_logging
+    from app.services.upload_jobs import upload_job_manager
 
+    await upload_job_manager.stop()
+    # embedding 批处理器只有在 embedding_service 被导入后才可能启动，
+    # 未导入时不必为了关闭它而加载 dashscope 等依赖
+    embedding_service = sys.modules.get("app.services.ai.embedding_service")
+    if embedding_service is not None:
+        await embedding_service.embedding_batcher.stop()
+    await http_client_manager.close()
+    await langchain_manager.close()
     await lp.disconnect()
     await adm.close()
 
-    logger.info("✅ Server shutdown complete")
\ No newline at end of file
+    logger.info("✅ Server shutdown complete")
+    stop_logging()
\ No newline at end of file
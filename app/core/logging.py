@@ -1,9 +1,15 @@
-# app/core/logging.py
 import logging
+import logging.handlers
 import os
+import queue
 import sys
+from typing import Optional
+
 from .config import config
 
+# 后台写日志的监听线程，关闭阶段由 lifespan 调用 stop_logging 停止
+_queue_listener: Optional[logging.handlers.QueueListener] = None
+
 
 def _configure_stdout_encoding():
     try:
@@ -17,6 +23,8 @@ def _configure_stdout_encoding():
 
 
 def setup_logging():
+    global _queue_listener
+
     log_dir = os.path.dirname(config.LOG_FILE_NAME)
     if log_dir and not os.path.exists(log_dir):
         os.makedirs(log_dir, exist_ok=True)
@@ -24,13 +32,49 @@ def setup_logging():
     _configure_stdout_encoding()
     # 打印到控制台和文件里，强制使用 UTF-8 编码
     stream_handler = logging.StreamHandler(sys.stdout)
-    file_handler = logging.FileHandler(config.LOG_FILE_NAME, encoding="utf-8")  # 指定 encoding
+    rotating_handler = logging.handlers.RotatingFileHandler(
+        config.LOG_FILE_NAME,
+        maxBytes=config.LOG_FILE_MAX_BYTES,
+        backupCount=config.LOG_FILE_BACKUP_COUNT,
+        encoding="utf-8",  # 指定 encoding
+    )
+    # 缓冲写文件：多条日志合并为一次写出，ERROR 及以上立即刷新
+    file_handler = logging.handlers.MemoryHandler(
+        capacity=config.LOG_BUFFER_CAPACITY,
+        flushLevel=logging.ERROR,
+        target=rotating_handler,
+    )
 
     # 显式设置 stream_handler 的编码
     stream_handler.encoding = 'utf-8'
 
+    formatter = logging.Formatter(config.LOG_FORMAT)
+    stream_handler.setFormatter(formatter)
+    rotating_handler.setFormatter(formatter)
+
+    # 事件循环线程只把日志记录放入队列，控制台和文件的写入由监听线程完成
+    log_queue = queue.SimpleQueue()
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    # QueueHandler 入队前只合并消息参数，完整格式由下游 handler 负责，避免重复前缀
+    queue_handler.setFormatter(logging.Formatter("%(message)s"))
+
+    stop_logging()
+    _queue_listener = logging.handlers.QueueListener(
+        log_queue, stream_handler, file_handler, respect_handler_level=True
+    )
+    _queue_listener.start()
+
     logging.basicConfig(
         level=config.LOG_LEVEL,
-        format=config.LOG_FORMAT,
-        handlers=[stream_handler, file_handler],
-    )
\ No newline at end of file
+        handlers=[queue_handler],
+    )
+
+
+def stop_logging():
+    """停止监听线程，队列中剩余的日志和文件缓冲会先全部写出"""
+    global _queue_listener
+    if _queue_listener is not None:
+        _queue_listener.stop()
+        for handler in _queue_listener.handlers:
+            handler.flush()
+        _queue_listener = None
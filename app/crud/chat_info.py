@@ -10,15 +10,8 @@ class ChatSessionCRUD:
         if not session_code:
             session_code = str(uuid6.uuid7())
 
-        # 使用原生 SQL 获取 nextval
-        result = await db.execute(
-            select(func.nextval(
-                'ai_chat_session_info_id_seq' if db.bind.dialect.name == 'postgresql' else 'sqlite_sequence'))
-        )
-        next_id = result.scalar() or 1
-
+        # id 由序列在 INSERT 中生成（INSERT ... RETURNING id），省去一次 nextval 查询
         new_session = ChatSession(
-            id=next_id,
             chat_session_code=session_code,
             user_intent=0,  # 默认值
             current_message_id=0
@@ -46,14 +39,7 @@ chat_session_crud = ChatSessionCRUD()
 class ChatMessageCRUD:
     async def insert_user_message(self, db: AsyncSession, session_info, current_message_id, ask_text):
         """插入用户消息"""
-        # 获取下一个ID
-        result = await db.execute(
-            select(func.nextval('ai_message_info_id_seq'))
-        )
-        next_id = result.scalar() or 1
-
         new_message = ChatMessage(
-            id=next_id,
             fk_session_id=session_info.id,
             message_id=current_message_id + 1,  # 用户消息ID
             parent_id=current_message_id,       # 父消息ID（如果没有则为0）
@@ -66,13 +52,7 @@ class ChatMessageCRUD:
 
     async def insert_ai_message(self, db: AsyncSession, session_info, message_id, content):
         """插入AI消息"""
-        result = await db.execute(
-            select(func.nextval('ai_message_info_id_seq'))
-        )
-        next_id = result.scalar() or 1
-
         new_message = ChatMessage(
-            id=next_id,
             fk_session_id=session_info.id,
             message_id=message_id + 1,  # AI消息ID（比用户消息大1）
             parent_id=message_id,        # 父消息ID（指向用户消息）
@@ -83,6 +63,30 @@ class ChatMessageCRUD:
         await db.flush()
         return new_message.id
 
+    async def insert_message_pair(self, db: AsyncSession, session_info, current_message_id, ask_text):
+        """
+        同时插入用户消息和 AI 占位消息，返回 (用户消息表ID, AI消息表ID)
+
+        两行在一次 flush 中写入，SQLAlchemy 合并为一条多行 INSERT ... RETURNING。
+        """
+        user_message = ChatMessage(
+            fk_session_id=session_info.id,
+            message_id=current_message_id + 1,  # 用户消息ID
+            parent_id=current_message_id,       # 父消息ID（如果没有则为0）
+            role="user",
+            message=ask_text
+        )
+        ai_message = ChatMessage(
+            fk_session_id=session_info.id,
+            message_id=current_message_id + 2,  # AI消息ID（比用户消息大1）
+            parent_id=current_message_id + 1,   # 父消息ID（指向用户消息）
+            role="assistant",
+            message=""
+        )
+        db.add_all([user_message, ai_message])
+        await db.flush()
+        return user_message.id, ai_message.id
+
     async def update_message(self, db: AsyncSession, message_id: int, content: str):
         """更新消息内容"""
         stmt = select(ChatMessage).where(ChatMessage.id == message_id)
@@ -98,5 +102,23 @@ class ChatMessageCRUD:
         result = await db.execute(stmt)
         return result.scalars().all()
 
+    async def stream_all_messages_of_session(self, db: AsyncSession, session_id: int):
+        """以服务端游标逐批读取会话的所有消息，按message_id排序"""
+        stmt = (
+            select(ChatMessage)
+            .where(ChatMessage.fk_session_id == session_id)
+            .order_by(ChatMessage.message_id)
+            .execution_options(yield_per=200)
+        )
+        return await db.stream_scalars(stmt)
+
+    async def get_messages_version(self, db: AsyncSession, session_id: int):
+        """获取会话的消息条数和最近更新时间，用于判断历史消息是否变化"""
+        stmt = select(func.count(ChatMessage.id), func.max(ChatMessage.update_time)).where(
+            ChatMessage.fk_session_id == session_id
+        )
+        result = await db.execute(stmt)
+        return result.one()
+
 
 chat_message_crud = ChatMessageCRUD()
\ No newline at end of file
@@ -1,10 +1,31 @@
 import logging
+import re
+from typing import Dict
+from app.core.config import config
 from app.core.dependencies import get_db_pool
 import asyncpg
 from fastapi import Depends
 
 logger = logging.getLogger(__name__)
 
+
+def configure_hnsw_params(row_count: int) -> Dict[str, int]:
+    """按数据量选择 HNSW 建索引参数，数据越多图的连通度越高"""
+    if row_count < 100_000:
+        return {"m": 16, "ef_construction": 64}
+    if row_count < 1_000_000:
+        return {"m": 24, "ef_construction": 128}
+    return {"m": 32, "ef_construction": 200}
+
+
+def _hnsw_index_params(indexdef: str) -> Dict[str, int]:
+    """从 pg_indexes.indexdef 中解析 HNSW 索引的 m / ef_construction"""
+    return {
+        key: int(value)
+        for key, value in re.findall(r"\b(m|ef_construction)\s*=\s*'?(\d+)'?", indexdef)
+    }
+
+
 class CommonCRUD:
 
     def __init__(self, pool: asyncpg.Pool):
@@ -26,7 +47,7 @@ class CommonCRUD:
                             filename VARCHAR(255) NOT NULL,
                             file_type VARCHAR(10),
                             content TEXT NOT NULL,
-                            content_vector vector(1536),
+                            content_vector halfvec(1536),
                             token_count INTEGER DEFAULT 0,
                             file_metadata JSONB DEFAULT '{}',
                             uploaded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
@@ -45,11 +66,8 @@ class CommonCRUD:
                     """)
 
                 try:
-                    await conn.execute("""
-                                       CREATE INDEX IF NOT EXISTS idx_documents_vector
-                                           ON documents USING ivfflat (content_vector vector_cosine_ops);
-                                       """)
-                    logger.info("Vector index created or already exists")
+                    await self._migrate_to_halfvec(conn)
+                    await self._create_vector_index(conn)
                 except Exception as e:
                     logger.warning(f"Cannot create vector index: {e}")
 
@@ -58,6 +76,17 @@ class CommonCRUD:
                                        ON documents(filename);
                                    """)
 
+                # 关键词检索的 ILIKE '%q%' 由三元组 GIN 索引支撑，避免全表扫描正文
+                try:
+                    await conn.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm;")
+                    await conn.execute("""
+                                       CREATE INDEX IF NOT EXISTS idx_documents_content_trgm
+                                           ON documents USING gin (content gin_trgm_ops);
+                                       """)
+                    logger.info("Trigram index created or already exists")
+                except Exception as e:
+                    logger.warning(f"Cannot create trigram index: {e}")
+
                 await conn.execute("""
                                    CREATE INDEX IF NOT EXISTS idx_query_asked_at
                                        ON query_history(asked_at DESC);
@@ -69,6 +98,88 @@ class CommonCRUD:
             logger.error(f"Failed to initialize tables: {e}")
             return False
 
+    async def _migrate_to_halfvec(self, conn: asyncpg.Connection):
+        """
+        把 content_vector 从 vector(1536) 迁移为 halfvec(1536)（需要 pgvector >= 0.7）
+
+        半精度存储使每行向量和索引体积减半，检索读取的页数随之减半。
+        旧索引的操作符类与 halfvec 不兼容，迁移前先删除，随后重建。
+        """
+        column_type = await conn.fetchval("""
+                                          SELECT format_type(atttypid, atttypmod)
+                                          FROM pg_attribute
+                                          WHERE attrelid = 'documents'::regclass
+                                            AND attname = 'content_vector'
+                                          """)
+        if not column_type or column_type.startswith("halfvec"):
+            return
+
+        logger.info(f"Migrating documents.content_vector from {column_type} to halfvec(1536)")
+        async with conn.transaction():
+            await conn.execute("DROP INDEX IF EXISTS idx_documents_vector")
+            await conn.execute("""
+                               ALTER TABLE documents
+                                   ALTER COLUMN content_vector TYPE halfvec(1536)
+                                   USING content_vector::halfvec(1536);
+                               """)
+
+    async def _create_vector_index(self, conn: asyncpg.Connection):
+        """
+        创建 HNSW 向量索引，旧的 ivfflat 索引会被替换
+
+        索引参数按数据量分档（configure_hnsw_params），数据量跨档后
+        以 CONCURRENTLY 方式重建，重建期间检索和写入不受阻塞。
+        """
+        indexdef = await conn.fetchval(
+            "SELECT indexdef FROM pg_indexes WHERE indexname = 'idx_documents_vector'"
+        )
+
+        # 取统计信息中的估算行数，避免启动时 COUNT(*) 全表扫描
+        row_count = await conn.fetchval("""
+                                        SELECT GREATEST(reltuples, 0)::bigint
+                                        FROM pg_class
+                                        WHERE oid = 'documents'::regclass
+                                        """)
+        params = configure_hnsw_params(row_count)
+
+        if indexdef and "hnsw" in indexdef:
+            if _hnsw_index_params(indexdef) == params:
+                logger.info("Vector index already exists")
+                return
+            logger.info(f"Retuning HNSW vector index for ~{row_count} rows: {params}")
+        elif indexdef:
+            logger.info("Replacing ivfflat vector index with HNSW")
+
+        # 连接归还连接池时会 RESET ALL，这里的设置只影响本次建索引
+        await conn.execute(
+            f"SET maintenance_work_mem = '{config.INDEX_MAINTENANCE_WORK_MEM}'"
+        )
+        await conn.execute(
+            f"SET max_parallel_maintenance_workers = {config.INDEX_MAINTENANCE_WORKERS}"
+        )
+
+        if not indexdef:
+            await conn.execute(f"""
+                               CREATE INDEX IF NOT EXISTS idx_documents_vector
+                                   ON documents USING hnsw (content_vector halfvec_cosine_ops)
+                                   WITH (m = {params["m"]}, ef_construction = {params["ef_construction"]});
+                               """)
+        else:
+            # 先建新索引再替换旧索引，重建期间旧索引继续服务检索
+            await conn.execute("DROP INDEX CONCURRENTLY IF EXISTS idx_documents_vector_new")
+            await conn.execute(f"""
+                               CREATE INDEX CONCURRENTLY idx_documents_vector_new
+                                   ON documents USING hnsw (content_vector halfvec_cosine_ops)
+                                   WITH (m = {params["m"]}, ef_construction = {params["ef_construction"]});
+                               """)
+            await conn.execute("DROP INDEX CONCURRENTLY idx_documents_vector")
+            await conn.execute(
+                "ALTER INDEX idx_documents_vector_new RENAME TO idx_documents_vector"
+            )
+
+        await conn.execute("ANALYZE documents;")
+        logger.info(f"HNSW vector index created (~{row_count} rows, {params})")
+
 # --- 关键：定义注入函数 ---
 def get_commons_crud(pool: asyncpg.Pool = Depends(get_db_pool)) -> CommonCRUD:
     return CommonCRUD(pool)
\ No newline at end of file
@@ -1,17 +1,24 @@
 import logging
-from typing import Dict, Optional, Any, List
+from typing import Dict, Optional, Any, List, Sequence, Tuple
 
 from app.core.dependencies import get_db_pool
 import asyncpg
 from fastapi import Depends
+from fastapi.concurrency import run_in_threadpool
 import json
 import datetime as dt
 from app.core.config import config
-from app.services.ai.token import count_tokens
+from app.crud.utils import acquire_conn
+from app.services.ai.token import count_tokens, count_tokens_batch
 
 logger = logging.getLogger(__name__)
 
 
+def _vector_literal(embedding: Sequence[float]) -> str:
+    """向量转为 pgvector 文本字面量 '[x,y,...]'（连接池未注册二进制编解码）"""
+    return "[" + ",".join(map(str, embedding)) + "]"
+
+
 class DocumentsCRUD:
     def __init__(self, pool: asyncpg.Pool):
         self.pool = pool
@@ -22,11 +29,13 @@ class DocumentsCRUD:
         content: str,
         file_type: str,
         metadata: Optional[Dict[str, Any]] = None,
+        conn: Optional[asyncpg.Connection] = None,
     ) -> Optional[int]:
         try:
-            token_count = count_tokens(content)
+            # 整篇文档分词是 CPU 密集操作，放到线程池执行（tiktoken 编码时释放 GIL）
+            token_count = await run_in_threadpool(count_tokens, content)
 
-            async with self.pool.acquire() as conn:
+            async with acquire_conn(self.pool, conn) as conn:
                 existing = await conn.fetchrow(
                     "SELECT id FROM documents WHERE filename = $1", filename
                 )
@@ -57,17 +66,108 @@ class DocumentsCRUD:
             logger.error(f"Failed to save document: {e}")
             return None
 
+    async def save_documents_bulk(
+        self,
+        rows: List[
+            Tuple[str, str, str, Optional[Dict[str, Any]], Optional[Sequence[float]]]
+        ],
+        conn: Optional[asyncpg.Connection] = None,
+    ) -> List[int]:
+        """
+        批量保存文档，rows 为 (filename, content, file_type, metadata, embedding)
+
+        一次查询找出已存在的文件名，其余行在同一事务内通过一条
+        INSERT ... SELECT FROM unnest(...) RETURNING 写入，embedding 随行写入；
+        已存在的文档只更新 embedding。返回与 rows 一一对应的文档 ID，失败时返回空列表。
+        """
+        if not rows:
+            return []
+        try:
+            async with acquire_conn(self.pool, conn) as conn, conn.transaction():
+                ids_by_filename = {
+                    record["filename"]: record["id"]
+                    for record in await conn.fetch(
+                        """
+                        SELECT filename, MIN(id) AS id FROM documents
+                        WHERE filename = ANY($1::varchar[])
+                        GROUP BY filename
+                        """,
+                        list({row[0] for row in rows}),
+                    )
+                }
+
+                existing_updates = []
+                new_rows = []
+                seen = set(ids_by_filename)
+                for filename, content, file_type, metadata, embedding in rows:
+                    if filename not in seen:
+                        seen.add(filename)
+                        new_rows.append((filename, content, file_type, metadata, embedding))
+                    elif filename in ids_by_filename and embedding is not None:
+                        existing_updates.append(
+                            (_vector_literal(embedding), ids_by_filename[filename])
+                        )
+
+                if new_rows:
+                    token_counts = await run_in_threadpool(
+                        count_tokens_batch, [row[1] for row in new_rows]
+                    )
+                    inserted = await conn.fetch(
+                        """
+                        INSERT INTO documents (filename, file_type, content, token_count,
+                                               file_metadata, content_vector, uploaded_at)
+                        SELECT r.filename, r.file_type, r.content, r.token_count,
+                               r.file_metadata::jsonb, r.content_vector::halfvec, $7
+                        FROM unnest($1::varchar[], $2::varchar[], $3::text[], $4::int[],
+                                    $5::text[], $6::text[])
+                             AS r(filename, file_type, content, token_count,
+                                  file_metadata, content_vector)
+                        RETURNING id, filename
+                        """,
+                        [row[0] for row in new_rows],
+                        [row[2] for row in new_rows],
+                        [row[1] for row in new_rows],
+                        token_counts,
+                        [json.dumps(row[3] or {}) for row in new_rows],
+                        [
+                            _vector_literal(row[4]) if row[4] is not None else None
+                            for row in new_rows
+                        ],
+                        dt.datetime.now(),
+                    )
+                    ids_by_filename.update(
+                        (record["filename"], record["id"]) for record in inserted
+                    )
+
+                if existing_updates:
+                    await conn.executemany(
+                        "UPDATE documents SET content_vector = $1::halfvec WHERE id = $2",
+                        existing_updates,
+                    )
+
+                logger.info(
+                    f"Documents saved in bulk: {len(new_rows)} new, "
+                    f"{len(rows) - len(new_rows)} existing"
+                )
+                return [ids_by_filename[row[0]] for row in rows]
+        except Exception as e:
+            logger.error(f"Failed to save documents in bulk: {e}")
+            return []
+
     async def update_document_embedding(
-        self, doc_id: int, embedding: List[float]
+        self,
+        doc_id: int,
+        embedding: List[float],
+        conn: Optional[asyncpg.Connection] = None,
     ) -> bool:
         try:
-            embedding_str = "[" + ",".join(map(str, embedding)) + "]"
+            embedding_str = _vector_literal(embedding)
 
-            async with self.pool.acquire() as conn:
+            async with acquire_conn(self.pool, conn) as conn:
                 await conn.execute(
                     """
                                    UPDATE documents
-                                   SET content_vector = $1::vector
+                                   SET content_vector = $1::halfvec
                                    WHERE id = $2
                                    """,
                     embedding_str,
@@ -80,12 +180,20 @@ class DocumentsCRUD:
             return False
 
     async def search_similar_documents(
-        self, query_embedding: List[float], limit: int = 5
+        self,
+        query_embedding: List[float],
+        limit: int = 5,
+        conn: Optional[asyncpg.Connection] = None,
     ) -> List[Dict[str, Any]]:
         try:
-            query_embedding_str = "[" + ",".join(map(str, query_embedding)) + "]"
+            query_embedding_str = _vector_literal(query_embedding)
 
-            async with self.pool.acquire() as conn:
+            async with acquire_conn(self.pool, conn) as conn, conn.transaction():
+                # 仅在本事务内生效（等同 SET LOCAL），不影响连接池中的其他请求
+                await conn.execute(
+                    "SELECT set_config('hnsw.ef_search', $1, true)",
+                    str(config.HNSW_EF_SEARCH),
+                )
                 results = await conn.fetch(
                     f"""
                     SELECT 
@@ -93,20 +201,23 @@ class DocumentsCRUD:
                         filename,
                         content,
                         file_metadata,
-                        1 - (content_vector <=> $1::vector) as similarity
+                        content_vector <=> $1::halfvec as distance
                     FROM documents
                     WHERE content_vector IS NOT NULL
-                    AND 1 - (content_vector <=> $1::vector) >= $2
-                    ORDER BY content_vector <=> $1::vector
-                    LIMIT $3
+                    ORDER BY content_vector <=> $1::halfvec
+                    LIMIT $2
                 """,
                     query_embedding_str,
-                    config.SIMILARITY_THRESHOLD,
                     limit,
                 )
 
+                # 阈值过滤放在取回之后：WHERE 中出现距离表达式会让 HNSW 索引失效
                 documents = []
                 for row in results:
+                    similarity = 1 - float(row["distance"])
+                    if similarity < config.SIMILARITY_THRESHOLD:
+                        continue
+
                     metadata = (
                         json.loads(row["file_metadata"]) if row["file_metadata"] else {}
                     )
@@ -117,7 +228,7 @@ class DocumentsCRUD:
                             "filename": row["filename"],
                             "content": row["content"],
                             "metadata": metadata,
-                            "similarity": float(row["similarity"]),
+                            "similarity": similarity,
                         }
                     )
 
@@ -130,9 +241,11 @@ class DocumentsCRUD:
             logger.error(f"Vector search failed: {e}")
             return []
 
-    async def keyword_search(self, query: str, limit: int = 5) -> List[Dict[str, Any]]:
+    async def keyword_search(
+        self, query: str, limit: int = 5, conn: Optional[asyncpg.Connection] = None
+    ) -> List[Dict[str, Any]]:
         try:
-            async with self.pool.acquire() as conn:
+            async with acquire_conn(self.pool, conn) as conn:
                 results = await conn.fetch(
                     f"""
                     SELECT 
@@ -6,6 +6,8 @@ from app.core.dependencies import get_db_pool
 import asyncpg
 from fastapi import Depends
 
+from app.crud.utils import acquire_conn
+
 logger = logging.getLogger(__name__)
 
 
@@ -19,9 +21,10 @@ class RAGHistoryCRUD:
         answer: str,
         used_docs: Optional[List[str]] = None,
         response_time: float = 0.0,
+        conn: Optional[asyncpg.Connection] = None,
     ) -> bool:
         try:
-            async with self.pool.acquire() as conn:
+            async with acquire_conn(self.pool, conn) as conn:
                 await conn.execute(
                     """
                        INSERT INTO query_history
@@ -40,48 +43,54 @@ class RAGHistoryCRUD:
             logger.error(f"Failed to save query history: {e}")
             return False
 
-    async def get_statistics(self) -> Dict[str, Any]:
+    async def get_statistics(
+        self, conn: Optional[asyncpg.Connection] = None
+    ) -> Dict[str, Any]:
         try:
-            async with self.pool.acquire() as conn:
-                stats = {}
-
-                stats["documents"] = await conn.fetchval(
-                    "SELECT COUNT(*) FROM documents"
-                )
-                stats["vectorized_documents"] = await conn.fetchval(
-                    "SELECT COUNT(*) FROM documents WHERE content_vector IS NOT NULL"
-                )
-                stats["queries"] = await conn.fetchval(
-                    "SELECT COUNT(*) FROM query_history"
-                )
-
-                recent = await conn.fetch("""
-                                          SELECT question, answer, asked_at
-                                          FROM query_history
-                                          ORDER BY asked_at DESC LIMIT 10
+            async with acquire_conn(self.pool, conn) as conn:
+                # 所有统计项合并为一条查询，一次往返取回
+                row = await conn.fetchrow("""
+                                          WITH d AS (
+                                              SELECT COUNT(*) AS total,
+                                                     COUNT(content_vector) AS vectorized
+                                              FROM documents
+                                          )
+                                          SELECT d.total AS documents,
+                                                 d.vectorized AS vectorized_documents,
+                                                 (SELECT COUNT(*) FROM query_history) AS queries,
+                                                 ARRAY(SELECT ROW(LEFT(question, 100),
+                                                                  length(question) > 100,
+                                                                  LEFT(answer, 100),
+                                                                  length(answer) > 100,
+                                                                  asked_at)
+                                                       FROM query_history
+                                                       ORDER BY asked_at DESC LIMIT 10) AS recent_queries,
+                                                 ARRAY(SELECT ROW(file_type, COUNT(*))
+                                                       FROM documents
+                                                       GROUP BY file_type) AS file_types
+                                          FROM d
                                           """)
 
+                stats = {
+                    "documents": row["documents"],
+                    "vectorized_documents": row["vectorized_documents"],
+                    "queries": row["queries"],
+                }
+
+                # 匿名 ROW 由 asyncpg 解码为按位置访问的记录；
+                # 问答文本在数据库端截断，只传回前 100 个字符及是否截断的标记
                 stats["recent_queries"] = [
                     {
-                        "question": row["question"][:100] + "..."
-                        if len(row["question"]) > 100
-                        else row["question"],
-                        "answer": row["answer"][:100] + "..."
-                        if row["answer"] and len(row["answer"]) > 100
-                        else row["answer"],
-                        "asked_at": row["asked_at"].isoformat(),
+                        "question": question + "..." if question_truncated else question,
+                        "answer": answer + "..." if answer_truncated else answer,
+                        "asked_at": asked_at.isoformat(),
                     }
-                    for row in recent
+                    for question, question_truncated, answer, answer_truncated, asked_at
+                    in row["recent_queries"]
                 ]
 
-                file_types = await conn.fetch("""
-                                              SELECT file_type, COUNT(*) as count
-                                              FROM documents
-                                              GROUP BY file_type
-                                              """)
-
                 stats["file_types"] = {
-                    row["file_type"]: row["count"] for row in file_types
+                    file_type: count for file_type, count in row["file_types"]
                 }
 
                 return stats
@@ -1,8 +1,29 @@
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
+
+import asyncpg
 from sqlalchemy import select, func
 from sqlalchemy.ext.asyncio import AsyncSession
 import logging
 logger = logging.getLogger(__name__)
 
+
+@asynccontextmanager
+async def acquire_conn(
+    pool: asyncpg.Pool, conn: Optional[asyncpg.Connection] = None
+) -> AsyncIterator[asyncpg.Connection]:
+    """
+    获取 asyncpg 连接：调用方已持有连接时直接复用，否则从连接池借出
+
+    同一请求内的多次 CRUD 调用可共享一条连接，省去反复 acquire/release。
+    """
+    if conn is not None:
+        yield conn
+        return
+    async with pool.acquire() as acquired:
+        yield acquired
+
+
 class UtilsCRUD:
 
     async def get_next_id(self, db: AsyncSession, table_name: str):
@@ -1,6 +1,7 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import HTMLResponse, ORJSONResponse
 from app.api.v1 import api_router
 from app.core.logging import setup_logging
 from app.core.lifespan import lifespan
@@ -17,6 +18,7 @@ app = FastAPI(
     lifespan=lifespan,
     docs_url="/docs",
     redoc_url="/redoc",
+    default_response_class=ORJSONResponse,
 )
 
 # 注册全局异常处理
@@ -30,6 +32,8 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# 检索结果、历史消息等大体积 JSON 压缩后返回；SSE 流（text/event-stream）不会被压缩
+app.add_middleware(GZipMiddleware, minimum_size=1024, compresslevel=5)
 
 # 3. 挂载路由
 app.include_router(api_router, prefix="/api/v1")
@@ -1,7 +1,7 @@
 from datetime import datetime
 from typing import Dict, Any
 
-from sqlalchemy import DateTime, func
+from sqlalchemy import DateTime, Sequence, func
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
 from sqlalchemy.types import Integer, String
@@ -22,7 +22,10 @@ class Base(DeclarativeBase):
 class ChatSession(Base):
     __tablename__ = "ai_chat_session_info"
 
-    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=False, comment="会话表ID")
+    # INSERT 时由序列生成 id 并通过 RETURNING 取回，无需单独查询 nextval
+    id: Mapped[int] = mapped_column(
+        Integer, Sequence("ai_chat_session_info_id_seq"), primary_key=True, comment="会话表ID"
+    )
     chat_session_code: Mapped[str] = mapped_column(String, unique=True, nullable=False, comment="会话编码")
     user_intent: Mapped[int] = mapped_column(Integer, comment="用户意图")
     current_message_id: Mapped[int] = mapped_column(Integer, comment="当前消息ID")
@@ -33,7 +36,9 @@ class ChatSession(Base):
 class ChatMessage(Base):
     __tablename__ = "ai_message_info"
 
-    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=False, comment="消息ID")
+    id: Mapped[int] = mapped_column(
+        Integer, Sequence("ai_message_info_id_seq"), primary_key=True, comment="消息ID"
+    )
     fk_session_id: Mapped[int] = mapped_column(Integer, comment="会话ID")
     message_id: Mapped[int] = mapped_column(Integer, comment="在当前会话中的消息序列")
     parent_id: Mapped[int] = mapped_column(Integer, comment="父级消息序列")
@@ -7,11 +7,15 @@
 
 from datetime import datetime
 from typing import Optional, List
-from sqlalchemy import DateTime, func, Index, Text, Float, String
+
+import numpy as np
+from sqlalchemy import DateTime, func, Index, Text, Float, String, text
 from sqlalchemy.dialects.postgresql import JSONB, ARRAY
-from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
+from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, validates
 from sqlalchemy.types import Integer, Boolean
 
+from app.core.config import config
+
 try:
     # 尝试从 pgvector.sqlalchemy 导入 Vector（推荐）
     from pgvector.sqlalchemy import Vector
@@ -19,6 +23,13 @@ except ImportError:
     # 降级方案：如果 pgvector 包未安装，使用通用的 ARRAY
     from sqlalchemy import ARRAY as Vector
 
+try:
+    # 半精度向量（pgvector >= 0.7），存储和索引体积减半
+    from pgvector.sqlalchemy import HALFVEC
+    _EMBEDDING_TYPE, _EMBEDDING_OPS = HALFVEC, "halfvec_ip_ops"
+except ImportError:
+    _EMBEDDING_TYPE, _EMBEDDING_OPS = Vector, "vector_ip_ops"
+
 class Base(DeclarativeBase):
     create_time: Mapped[datetime] = mapped_column(
         DateTime,
@@ -41,6 +52,10 @@ class Document(Base):
     - 向量索引（memory）+ 向量数据（disk）分离
     - 标签索引（memory）+ 标签数据（disk）分离
     - 关键词数据放PostgreSQL
+
+    tags / extra_metadata 的 GIN 索引使用 jsonb_path_ops，只有顶层 @> 包含查询
+    能命中索引，例如 tags @> '{"categories": ["技术"]}'；
+    tags->'categories' ? '技术' 这类写法会退化为全表扫描。
     """
     __tablename__ = "ai_documents"
     
@@ -55,7 +70,7 @@ class Document(Base):
     source_url: Mapped[Optional[str]] = mapped_column(String(1024), comment="来源URL")
     
     # ===== 向量字段（内存索引 + 磁盘存储） =====
-    embedding: Mapped[Optional[Vector]] = mapped_column(Vector(1536), comment="文档向量（1536维）")
+    embedding: Mapped[Optional[Vector]] = mapped_column(_EMBEDDING_TYPE(1536), comment="文档向量（1536维，半精度）")
     embedding_model: Mapped[str] = mapped_column(String(100), default="nomic-embed-text", comment="向量模型名称")
     
     # ===== 关键词字段（PostgreSQL 存储） =====
@@ -96,11 +111,31 @@ class Document(Base):
     
     # ===== 索引定义 =====
     __table_args__ = (
-        # 向量相似度搜索索引
-        Index('ix_document_embedding', 'embedding', postgresql_using='ivfflat'),
+        # 向量相似度搜索索引（HNSW，内积；无需训练数据，召回率和 QPS 均优于 ivfflat）
+        # 向量写入时已归一化，内积即余弦相似度，检索时省去逐行求范数
+        Index(
+            'ix_document_embedding_hnsw',
+            'embedding',
+            postgresql_using='hnsw',
+            postgresql_with={'m': config.HNSW_M, 'ef_construction': config.HNSW_EF_CONSTRUCTION},
+            postgresql_ops={'embedding': _EMBEDDING_OPS},
+        ),
         
-        # 标签快速查询索引
-        Index('ix_document_tags', 'tags', postgresql_using='gin'),
+        # 标签 / 元数据快速查询索引（jsonb_path_ops：体积更小，只支持 @> 包含查询）
+        Index('ix_document_tags', 'tags', postgresql_using='gin', postgresql_ops={'tags': 'jsonb_path_ops'}),
+        # auto_tags 是最常用的嵌套路径，单独建表达式索引：
+        # tags -> 'auto_tags' @> '["transformer"]' 只扫描这一小块索引
+        Index(
+            'ix_document_tags_auto_tags',
+            text("(tags -> 'auto_tags') jsonb_path_ops"),
+            postgresql_using='gin',
+        ),
+        Index(
+            'ix_document_extra_metadata',
+            'extra_metadata',
+            postgresql_using='gin',
+            postgresql_ops={'extra_metadata': 'jsonb_path_ops'},
+        ),
         
         # 关键词全文搜索索引
         Index('ix_document_keywords', 'keywords', postgresql_using='gin'),
@@ -109,6 +144,15 @@ class Document(Base):
         Index('ix_document_is_indexed_is_tagged', 'is_indexed', 'is_tagged'),
     )
     
+    @validates("embedding")
+    def _normalize_embedding(self, key, embedding):
+        """写入前把向量归一化为单位长度，检索时可直接用内积代替余弦距离"""
+        if embedding is None:
+            return None
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = float(np.linalg.norm(vector))
+        return vector / norm if norm else vector
+
     def __repr__(self):
         return f"<Document(id={self.id}, title={self.title[:30]}..., is_indexed={self.is_indexed}, is_tagged={self.is_tagged})>"
     
@@ -183,7 +227,7 @@ class DocumentEmbeddingIndex(Base):
     
     # 向量统计信息
     embedding_dim: Mapped[int] = mapped_column(Integer, default=1536, comment="向量维度")
-    norm: Mapped[float] = mapped_column(Float, comment="向量的L2范数")
+    norm: Mapped[float] = mapped_column(Float, default=1.0, comment="向量的L2范数（写入时已归一化，恒为 1）")
     
     # 性能指标
     search_count: Mapped[int] = mapped_column(Integer, default=0, comment="被搜索次数")
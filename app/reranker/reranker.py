@@ -2,6 +2,7 @@
 """
 重排序模块 - 可选依赖，不影响原有功能
 """
+import asyncio
 import logging
 from typing import Optional, List, Tuple, Any
 import importlib.util
@@ -18,6 +19,7 @@ class Reranker:
         self._available = None
         self._embedding_model = None
         self._embedding_available = None
+        self._prepare_task: Optional[asyncio.Future] = None
 
     def is_available(self) -> bool:
         """检查重排序是否可用"""
@@ -69,6 +71,31 @@ class Reranker:
             self._embedding_available = False
             return None
 
+    def _load_rerank_model(self):
+        """加载 retrieve_documents 实际会用到的重排模型（优先向量模型）"""
+        if self.is_embedding_available():
+            self.load_embedding_model()
+        elif self.is_available():
+            self.load_model()
+
+    async def prepare(self):
+        """
+        在线程池中预加载重排模型，可与向量检索并发执行
+
+        多次调用共享同一个加载任务；调用方被取消时不影响加载本身。
+        """
+        if self._prepare_task is None:
+            self._prepare_task = asyncio.ensure_future(
+                asyncio.to_thread(self._load_rerank_model)
+            )
+            self._prepare_task.add_done_callback(self._on_prepare_done)
+        await asyncio.shield(self._prepare_task)
+
+    def _on_prepare_done(self, task: asyncio.Future):
+        # 加载失败时清掉任务，下次调用重新加载，而不是一直复用失败的结果
+        if task.cancelled() or task.exception() is not None:
+            self._prepare_task = None
+
     def rerank(self, query: str, documents: List[str], top_k: Optional[int] = None) -> List[Tuple[str, float]]:
         """
         对文档进行重排序
@@ -131,21 +158,23 @@ class Reranker:
 
         try:
             import numpy as np
-            from sklearn.metrics.pairwise import cosine_similarity
 
-            query_embedding = model.encode([query], convert_to_numpy=True)
-            doc_embeddings = model.encode(documents, convert_to_numpy=True)
+            # 查询和文档一次批量编码，向量已归一化，余弦相似度即点积
+            embeddings = model.encode(
+                [query, *documents], convert_to_numpy=True, normalize_embeddings=True
+            )
+            query_embedding, doc_embeddings = embeddings[0], embeddings[1:]
 
-            similarities = cosine_similarity(query_embedding, doc_embeddings)[0]
-            normalized_scores = (similarities + 1) / 2
+            normalized_scores = (doc_embeddings @ query_embedding + 1) / 2
 
-            scored = list(zip(documents, normalized_scores.tolist()))
-            scored.sort(key=lambda x: x[1], reverse=True)
+            # 只对前 top_k 个做完整排序
+            if top_k and top_k < len(documents):
+                order = np.argpartition(-normalized_scores, top_k - 1)[:top_k]
+            else:
+                order = np.arange(len(documents))
+            order = order[np.argsort(-normalized_scores[order], kind="stable")]
 
-            if top_k:
-                scored = scored[:top_k]
-
-            return scored
+            return [(documents[i], float(normalized_scores[i])) for i in order]
         except Exception as e:
             logger.error(f"Vector cosine reranking failed: {e}")
             return [(doc, 0.0) for doc in documents[:top_k]] if top_k else [(doc, 0.0) for doc in documents]
@@ -1,18 +1,67 @@
+import asyncio
+from collections import defaultdict, deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+from langchain_core.documents import Document
 from langchain_core.tools import tool
 from app.core.langchain import langchain_manager
 from app.core.config import config
 from app.reranker.reranker import reranker
+from app.services.retrieval_cache import retrieval_cache
 import logging
-import json
+import orjson
 
 logger = logging.getLogger(__name__)
 
+# 返回给智能体的元数据字段，其余字段只会白白占用上下文 token
+_ITEM_METADATA_KEYS = ("filename", "file_type", "chunk_index", "topic", "page", "source")
+
+
+def _reorder_by_rerank(docs: List[Document], reranked: List[Tuple[str, float]]) -> List[Document]:
+    """按重排结果的内容顺序取回文档，内容相同的文档按原顺序依次对应"""
+    idx_by_content: Dict[str, Deque[int]] = defaultdict(deque)
+    for i, doc in enumerate(docs):
+        idx_by_content[doc.page_content].append(i)
+
+    ordered = []
+    for content, _ in reranked:
+        indices = idx_by_content.get(content)
+        if indices:
+            ordered.append(docs[indices.popleft()])
+    return ordered
+
+
+def _discard_task(task: Optional[asyncio.Task]):
+    """收尾未被等待的后台任务：未完成则取消，已完成则读取异常，避免 "never retrieved" 日志"""
+    if task is None:
+        return
+    if not task.done():
+        task.cancel()
+    elif not task.cancelled():
+        task.exception()
+
+
+def _top_result_dominates(docs_and_distances: List[Tuple[Document, float]]) -> bool:
+    """第一名与第二名的余弦距离差超过阈值时，认为第一名明显领先"""
+    if len(docs_and_distances) < 2:
+        return False
+    gap = docs_and_distances[1][1] - docs_and_distances[0][1]
+    return gap > config.RERANK_SKIP_DISTANCE_GAP
+
 
 @tool
 async def retrieve_documents(query: str, k: int = 5) -> str:
     """
     检索知识库中的相关文档片段，返回 JSON 字符串，包含 items 列表。
     """
+    # 智能体重试时常重复相同的检索，直接复用已序列化的结果
+    key = retrieval_cache.make_key(query.strip().lower(), k)
+    return await retrieval_cache.get_or_compute(key, lambda: _retrieve_documents(query, k))
+
+
+async def _retrieve_documents(query: str, k: int) -> Tuple[str, bool]:
+    """执行检索，返回 (JSON 字符串, 是否可缓存)；出错的结果不缓存"""
+    prepare_task = None
     try:
         # 单表模式：直接获取向量存储
         vectorstore = langchain_manager.get_vectorstore()
@@ -20,62 +69,66 @@ async def retrieve_documents(query: str, k: int = 5) -> str:
         # 🛡️ 检查向量存储是否可用
         if vectorstore is None:
             logger.error("❌ Vectorstore is None - ai_documents table not available or not initialized")
-            return json.dumps({
+            return orjson.dumps({
                 "items": [], 
                 "count": 0,
                 "error": "Knowledge base not initialized. Please import documents first."
-            }, ensure_ascii=False)
+            }).decode(), False
         
+        # 重排模型的加载与向量检索并发进行，首次调用不再串行等待两者
+        prepare_task = (
+            asyncio.create_task(reranker.prepare())
+            if getattr(config, 'RERANKER_ENABLED', False)
+            else None
+        )
+
         # 执行向量相似度搜索
         try:
             initial_k = k * 2 if getattr(config, 'RERANKER_ENABLED', False) else k
-            docs = await vectorstore.asimilarity_search(query, k=initial_k)
+            # HNSW 最多返回 ef_search 条候选（连接上已设置为 HNSW_EF_SEARCH），k 再大也取不回更多
+            if initial_k > config.HNSW_EF_SEARCH:
+                logger.info(
+                    f"Clamping initial_k {initial_k} to hnsw.ef_search={config.HNSW_EF_SEARCH}"
+                )
+                initial_k = config.HNSW_EF_SEARCH
+            docs_and_distances = await vectorstore.asimilarity_search_with_score(query, k=initial_k)
         except AttributeError as e:
             logger.error(f"❌ Vectorstore method error: {e}")
-            return json.dumps({
+            return orjson.dumps({
                 "items": [],
                 "count": 0,
                 "error": "Vectorstore interface error"
-            }, ensure_ascii=False)
+            }).decode(), False
 
-        if not docs:
+        if not docs_and_distances:
             logger.debug(f"No documents found for query: {query}")
-            return json.dumps({"items": [], "count": 0}, ensure_ascii=False)
+            return orjson.dumps({"items": [], "count": 0}).decode(), True
+
+        docs = [doc for doc, _ in docs_and_distances]
 
-        # 重排序处理
-        if getattr(config, 'RERANKER_ENABLED', False) and reranker.is_embedding_available() and len(docs) > 1:
+        # 重排序处理：向量检索的第一名已明显领先时，重排不会改变结论，直接跳过
+        if _top_result_dominates(docs_and_distances):
+            logger.debug("Top vector result dominates, skipping rerank")
+            docs = docs[:k]
+        elif getattr(config, 'RERANKER_ENABLED', False) and reranker.is_embedding_available() and len(docs) > 1:
             try:
+                await prepare_task
                 doc_contents = [doc.page_content for doc in docs]
                 reranked = reranker.rerank_by_vector_cosine(query, doc_contents, top_k=k)
 
-                new_docs = []
-                used = set()
-                for content, score in reranked:
-                    for i, doc in enumerate(docs):
-                        if i not in used and doc.page_content == content:
-                            new_docs.append((doc, score))
-                            used.add(i)
-                            break
-
+                new_docs = _reorder_by_rerank(docs, reranked)
                 if len(new_docs) == k:
-                    docs = [d for d, _ in new_docs]
+                    docs = new_docs
             except Exception as e:
                 logger.warning(f"Vector cosine reranking failed: {e}")
                 docs = docs[:k]
         elif getattr(config, 'RERANKER_ENABLED', False) and reranker.is_available() and len(docs) > 1:
             try:
+                await prepare_task
                 doc_contents = [doc.page_content for doc in docs]
                 reranked = reranker.rerank(query, doc_contents, top_k=k)
 
-                new_docs = []
-                used = set()
-                for content, _ in reranked:
-                    for i, doc in enumerate(docs):
-                        if i not in used and doc.page_content == content:
-                            new_docs.append(doc)
-                            used.add(i)
-                            break
-
+                new_docs = _reorder_by_rerank(docs, reranked)
                 if len(new_docs) == k:
                     docs = new_docs
             except Exception as e:
@@ -87,8 +140,12 @@ async def retrieve_documents(query: str, k: int = 5) -> str:
         items = []
         for i, doc in enumerate(docs, 1):
             filename = doc.metadata.get("filename", "未知文档") if doc.metadata else "未知文档"
-            content = doc.page_content.strip()
-            metadata = dict(doc.metadata) if doc.metadata else {}
+            content = doc.page_content.strip()[: config.RETRIEVAL_CONTENT_MAX_CHARS]
+            metadata = (
+                {key: doc.metadata[key] for key in _ITEM_METADATA_KEYS if key in doc.metadata}
+                if doc.metadata
+                else {}
+            )
             items.append({
                 "index": i,
                 "filename": filename,
@@ -96,7 +153,7 @@ async def retrieve_documents(query: str, k: int = 5) -> str:
                 "metadata": metadata,
             })
 
-        return json.dumps({"items": items, "count": len(items)}, ensure_ascii=False)
+        return orjson.dumps({"items": items, "count": len(items)}).decode(), True
 
     except Exception as e:
         error_msg = f"{type(e).__name__}: {str(e)}"
@@ -107,11 +164,13 @@ async def retrieve_documents(query: str, k: int = 5) -> str:
         else:
             friendly_error = f"Retrieval error: {str(e)}"
         
-        return json.dumps({
+        return orjson.dumps({
             "items": [], 
             "count": 0,
             "error": friendly_error
-        }, ensure_ascii=False)
+        }).decode(), False
+    finally:
+        _discard_task(prepare_task)
 
 
 @tool
@@ -1,5 +1,7 @@
-import aiohttp
+import httpx
+import orjson
 import dashscope
+from functools import lru_cache
 from typing import List, Dict, Any
 import logging
 from fastapi import Depends
@@ -8,6 +10,7 @@ from app.services.ai.search_service import SearchService, get_search_service
 from app.services.ai.embedding_service import EmbeddingService, get_embedding_service
 
 from app.core.config import config
+from app.core.http import http_client_manager
 
 logger = logging.getLogger(__name__)
 
@@ -22,12 +25,9 @@ class ChatService:
         self.api_key = config.DASHSCOPE_API_KEY
         self.base_url = config.DASHSCOPE_BASE_URL
         self.app_base_url = config.DASHSCOPE_APP_BASE_URL
-        self.headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json",
-        }
         self.app_id = config.DASHSCOPE_APP_ID
-        self.timeout = aiohttp.ClientTimeout(total=config.API_TIMEOUT)
+        self.chat_url = f"{self.base_url}/chat/completions"
+        self.timeout = httpx.Timeout(config.API_TIMEOUT)
 
     async def chat_completion(self, messages: List[Dict[str, str]], **kwargs) -> str:
         try:
@@ -41,21 +41,20 @@ class ChatService:
 
             logger.info(f"Calling DashScope API with model: {config.CHAT_MODEL}")
 
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    f"{self.base_url}/chat/completions",
-                    headers=self.headers,
-                    json=data,
-                    timeout=self.timeout,
-                ) as response:
-                    if response.status == 200:
-                        result = await response.json()
-                        return result["choices"][0]["message"]["content"]
-                    else:
-                        error_text = await response.text()
-                        raise Exception(
-                            f"Chat API error {response.status}: {error_text}"
-                        )
+            client = http_client_manager.get_client()
+            response = await client.post(
+                self.chat_url,
+                content=orjson.dumps(data),
+                timeout=self.timeout,
+            )
+            if response.status_code == 200:
+                result = orjson.loads(response.content)
+                return result["choices"][0]["message"]["content"]
+            else:
+                error_text = response.text
+                raise Exception(
+                    f"Chat API error {response.status_code}: {error_text}"
+                )
         except Exception as e:
             logger.error(f"Chat API error: {e}")
             raise Exception(f"Failed to get chat completion: {str(e)}")
@@ -100,7 +99,8 @@ class ChatService:
             }
 
 
-# 注入工厂
+# 注入工厂：依赖的服务都是单例，按参数缓存后 ChatService 也只会构建一次
+@lru_cache(maxsize=1)
 def get_chat_service(
     search_service: SearchService = Depends(get_search_service),
     embedding_service: EmbeddingService = Depends(get_embedding_service),
@@ -1,7 +1,15 @@
+import asyncio
 import logging
-import aiohttp
-from typing import List
+from collections import OrderedDict
+from functools import lru_cache
+from typing import List, Optional
+
+import httpx
+import orjson
+import numpy as np
 from app.core.config import config
+from app.core.embedding_cache import EmbeddingCache
+from app.core.http import http_client_manager
 
 import dashscope
 
@@ -9,48 +17,179 @@ import dashscope
 logger = logging.getLogger(__name__)
 
 
+# 进程内共享缓存
+embedding_cache = EmbeddingCache(maxsize=config.EMBEDDING_CACHE_SIZE)
+
+
 class EmbeddingService:
     def __init__(self):
         self.api_key = config.DASHSCOPE_API_KEY
         self.base_url = config.DASHSCOPE_BASE_URL
         self.app_base_url = config.DASHSCOPE_APP_BASE_URL
-        self.headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json",
-        }
         self.app_id = config.DASHSCOPE_APP_ID
+        self.embed_url = f"{self.base_url}/embeddings"
         self.deep_search_agent_id = config.DEEP_SEARCH_AGENT_ID
         self.deep_search_agent_version = config.DEEP_SEARCH_AGENT_VERSION
-        self.timeout = aiohttp.ClientTimeout(total=config.EMBEDDING_TIMEOUT)
+        self.timeout = httpx.Timeout(config.EMBEDDING_TIMEOUT)
+        self.cache = embedding_cache
 
         dashscope.api_key = self.api_key
 
-    async def get_embedding(self, text: str) -> List[float]:
+    async def _request_embeddings(self, inputs: List[str]) -> List[List[float]]:
+        """调用 DashScope embeddings 接口，input 支持批量"""
+        client = http_client_manager.get_client()
+        response = await client.post(
+            self.embed_url,
+            content=orjson.dumps(
+                {
+                    "model": config.EMBEDDING_MODEL,
+                    "input": inputs,
+                    "encoding_format": "float",
+                }
+            ),
+            timeout=self.timeout,
+        )
+        if response.status_code == 200:
+            result = orjson.loads(response.content)
+            data = sorted(result["data"], key=lambda item: item.get("index", 0))
+            return [item["embedding"] for item in data]
+        else:
+            error_text = response.text
+            raise Exception(f"API error {response.status_code}: {error_text}")
+
+    async def get_embedding(self, text: str) -> np.ndarray:
+        """返回 float32 向量（只读），调用方无需再做 np.array 转换"""
+        key = self.cache.make_key(config.EMBEDDING_MODEL, text)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    f"{self.base_url}/embeddings",
-                    headers=self.headers,
-                    json={
-                        "model": config.EMBEDDING_MODEL,
-                        "input": text,
-                        "encoding_format": "float",
-                    },
-                    timeout=self.timeout,
-                ) as response:
-                    if response.status == 200:
-                        result = await response.json()
-                        embedding = result["data"][0]["embedding"]
-                        logger.info(f"Generated embedding: {len(embedding)} dimensions")
-                        return embedding
-                    else:
-                        error_text = await response.text()
-                        raise Exception(f"API error {response.status}: {error_text}")
+            embedding = await embedding_batcher.submit(text)
+            logger.info(f"Generated embedding: {len(embedding)} dimensions")
+            return self.cache.set(key, embedding)
         except Exception as e:
             logger.error(f"Embedding API error: {e}")
             raise Exception(f"Failed to generate embedding: {str(e)}")
 
+    async def get_embeddings_many(self, texts: List[str]) -> List[np.ndarray]:
+        """批量获取 embedding，只对未命中缓存的文本发起请求"""
+        results: List[Optional[np.ndarray]] = [None] * len(texts)
+        missing: "OrderedDict[bytes, List[int]]" = OrderedDict()
+        missing_texts: List[str] = []
+
+        for i, text in enumerate(texts):
+            key = self.cache.make_key(config.EMBEDDING_MODEL, text)
+            cached = self.cache.get(key)
+            if cached is not None:
+                results[i] = cached
+            elif key in missing:
+                missing[key].append(i)
+            else:
+                missing[key] = [i]
+                missing_texts.append(text)
+
+        if missing_texts:
+            try:
+                keys = list(missing.keys())
+                batch_size = config.EMBEDDING_BATCH_SIZE
+                for start in range(0, len(missing_texts), batch_size):
+                    batch = missing_texts[start:start + batch_size]
+                    embeddings = await self._request_embeddings(batch)
+                    for key, embedding in zip(keys[start:start + batch_size], embeddings):
+                        vector = self.cache.set(key, embedding)
+                        for i in missing[key]:
+                            results[i] = vector
+            except Exception as e:
+                logger.error(f"Embedding API error: {e}")
+                raise Exception(f"Failed to generate embeddings: {str(e)}")
+
+        logger.info(
+            f"Generated {len(texts)} embeddings ({len(texts) - len(missing_texts)} cache hits)"
+        )
+        return results
+
+
+class EmbeddingBatcher:
+    """
+    Embedding 微批处理器
+
+    把并发的单条 get_embedding 请求在短时间窗口内合并成一次批量请求，
+    减少到 DashScope 的往返次数。已经是批量的调用方应直接使用
+    EmbeddingService.get_embeddings_many。
+    """
+
+    def __init__(self, max_batch_size: int = 10, max_wait_ms: float = 5):
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _ensure_worker(self):
+        loop = asyncio.get_running_loop()
+        if self._task is None or self._task.done() or self._loop is not loop:
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._task = loop.create_task(self._run())
+
+    async def submit(self, text: str) -> List[float]:
+        """提交单条文本，等待所在批次返回结果"""
+        self._ensure_worker()
+        future = self._loop.create_future()
+        await self._queue.put((text, future))
+        return await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            batch = [(text, future) for text, future in batch if not future.done()]
+            if not batch:
+                continue
+
+            try:
+                embeddings = await get_embedding_service()._request_embeddings(
+                    [text for text, _ in batch]
+                )
+                for (_, future), embedding in zip(batch, embeddings):
+                    if not future.done():
+                        future.set_result(embedding)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+    async def stop(self):
+        """停止后台批处理任务"""
+        if self._task and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+        self._queue = None
+        self._loop = None
+
+
+embedding_batcher = EmbeddingBatcher(
+    max_batch_size=config.EMBEDDING_BATCH_SIZE,
+    max_wait_ms=config.EMBEDDING_BATCH_WAIT_MS,
+)
+
 
-# 注入工厂
+# 注入工厂：进程内单例，首次注入时才构建（而不是在 import 时）
+@lru_cache(maxsize=1)
 def get_embedding_service() -> EmbeddingService:
     return EmbeddingService()
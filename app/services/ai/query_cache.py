@@ -0,0 +1,106 @@
+"""
+语义查询缓存
+
+对近期问题的 embedding 做余弦相似度匹配，命中（相似度 >= 阈值）时直接返回
+缓存的回答，跳过检索和 LLM 生成。
+"""
+import logging
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from app.core.config import config
+
+logger = logging.getLogger(__name__)
+
+
+class SemanticQueryCache:
+    """
+    定长矩阵实现的语义缓存：LRU 淘汰（命中会刷新最近使用时间），读取时按写入时间检查 TTL
+
+    向量写入时即归一化并存入连续的 float32 矩阵，查询只需一次
+    matrix @ query（BLAS sgemv）即可得到全部余弦相似度。
+    """
+
+    def __init__(self, capacity: int = 4096, threshold: float = 0.92, ttl: float = 3600):
+        self.capacity = capacity
+        self.threshold = threshold
+        self.ttl = ttl
+        self._matrix: Optional[np.ndarray] = None
+        # 写入时间（判断 TTL）和最近使用时间（LRU 淘汰）
+        self._created_at = np.zeros(capacity, dtype=np.float64)
+        self._last_used = np.zeros(capacity, dtype=np.float64)
+        self._entries: List[Optional[Dict[str, Any]]] = [None] * capacity
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def lookup(self, embedding) -> Optional[Dict[str, Any]]:
+        """查找语义相近的缓存条目"""
+        with self._lock:
+            if self._matrix is None or self._size == 0:
+                return None
+
+            query = self._normalize(embedding)
+            if query is None or query.shape[0] != self._matrix.shape[1]:
+                return None
+
+            n = self._size
+            now = time.time()
+            sims = self._matrix[:n] @ query
+            sims[self._created_at[:n] < now - self.ttl] = -1.0
+
+            best = int(np.argmax(sims))
+            if sims[best] < self.threshold:
+                return None
+
+            self._last_used[best] = now
+
+            logger.info(f"Semantic cache hit (similarity={sims[best]:.4f})")
+            return self._entries[best]
+
+    @staticmethod
+    def _normalize(embedding) -> Optional[np.ndarray]:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = float(np.linalg.norm(vector))
+        if norm == 0:
+            return None
+        return vector / norm
+
+    def add(self, embedding, entry: Dict[str, Any]):
+        """写入缓存，满了之后覆盖最久未使用的条目"""
+        vector = self._normalize(embedding)
+        if vector is None:
+            return
+        with self._lock:
+            if self._matrix is None or self._matrix.shape[1] != vector.shape[0]:
+                # 维度在首次写入时确定，之后整块复用，不再分配
+                self._matrix = np.empty((self.capacity, vector.shape[0]), dtype=np.float32)
+                self._size = 0
+
+            if self._size < self.capacity:
+                i = self._size
+                self._size += 1
+            else:
+                i = int(np.argmin(self._last_used))
+
+            now = time.time()
+            self._matrix[i] = vector
+            self._created_at[i] = now
+            self._last_used[i] = now
+            self._entries[i] = entry
+
+    def clear(self):
+        with self._lock:
+            self._matrix = None
+            self._entries = [None] * self.capacity
+            self._size = 0
+
+
+# 全局缓存实例
+query_cache = SemanticQueryCache(
+    capacity=config.QUERY_CACHE_SIZE,
+    threshold=config.QUERY_CACHE_THRESHOLD,
+    ttl=config.QUERY_CACHE_TTL,
+)
@@ -1,5 +1,6 @@
 import logging
 import time
+import numpy as np
 import pandas as pd
 from typing import List, Dict, Any, Optional
 from fastapi import Depends
@@ -203,18 +204,24 @@ class RAGProcessor:
 
             logger.info(f"Processing {len(documents)} documents from {filename}")
 
-            saved_ids = []
-            for doc in documents:
-                doc_id = await self.doc_crud.save_document(
-                    doc["filename"], doc["content"], doc["file_type"], doc["metadata"]
-                )
-
-                if doc_id:
-                    saved_ids.append(doc_id)
+            # 先算好全部分块的 embedding，再借连接写库：HTTP 调用期间不占用池连接
+            embeddings = await self._generate_document_embeddings(
+                [doc["content"] for doc in documents]
+            )
 
-                    await self._generate_document_embedding(doc_id, doc["content"])
-                else:
-                    logger.warning(f"Failed to save document: {doc['filename']}")
+            # 整个文件一条语句批量写入（同一事务），embedding 随行写入
+            saved_ids = await self.doc_crud.save_documents_bulk(
+                [
+                    (
+                        doc["filename"],
+                        doc["content"],
+                        doc["file_type"],
+                        doc["metadata"],
+                        embedding,
+                    )
+                    for doc, embedding in zip(documents, embeddings)
+                ]
+            )
 
             if saved_ids:
                 result["success"] = True
@@ -237,17 +244,15 @@ class RAGProcessor:
             result["message"] = f"Error: {str(e)}"
             return result
 
-    async def _generate_document_embedding(self, doc_id: int, content: str):
+    async def _generate_document_embeddings(
+        self, contents: List[str]
+    ) -> List[Optional[np.ndarray]]:
+        """批量生成分块 embedding；失败时返回全 None，文档照常入库、不带向量"""
         try:
-            embedding = await self.embedding_service.get_embedding(content)
-
-            if embedding:
-                await self.doc_crud.update_document_embedding(doc_id, embedding)
-                logger.info(f"Embedding generated for document {doc_id}")
-            else:
-                logger.error(f"Failed to generate embedding for document {doc_id}")
+            return await self.embedding_service.get_embeddings_many(contents)
         except Exception as e:
-            logger.error(f"Embedding generation failed for document {doc_id}: {e}")
+            logger.error(f"Embedding generation failed for {len(contents)} chunks: {e}")
+            return [None] * len(contents)
 
     async def ask_question(
         self,
@@ -283,21 +288,27 @@ class RAGProcessor:
                 logger.info(f"Database has {total_docs} total documents")
 
                 if total_docs > 0:
-                    vectorized_docs = stats.get("vectorized_documents", 0)
-
-                    if vectorized_docs > 0:
+                    question_embedding = None
+                    if stats.get("vectorized_documents", 0) > 0:
                         try:
                             logger.info(
                                 f"Trying vector search for: {question[:100]}..."
                             )
+                            # embedding 在借连接之前计算，HTTP 调用期间不占用池连接
                             question_embedding = (
                                 await self.embedding_service.get_embedding(question)
                             )
+                        except Exception as vector_error:
+                            search_method = "vector_error"
+                            logger.error(f"Vector search failed: {vector_error}")
 
-                            if question_embedding:
+                    # 向量检索与关键词兜底共用一条连接
+                    async with self.doc_crud.pool.acquire() as conn:
+                        if question_embedding is not None and question_embedding.size:
+                            try:
                                 context_docs = (
                                     await self.doc_crud.search_similar_documents(
-                                        question_embedding, config.MAX_CONTEXT_CHUNKS
+                                        question_embedding, config.MAX_CONTEXT_CHUNKS, conn=conn
                                     )
                                 )
 
@@ -306,27 +317,27 @@ class RAGProcessor:
                                     logger.info(
                                         f"Vector search found {len(context_docs)} documents"
                                     )
-                        except Exception as vector_error:
-                            search_method = "vector_error"
-                            logger.error(f"Vector search failed: {vector_error}")
-
-                    if not context_docs:
-                        try:
-                            logger.info(
-                                f"Trying keyword search for: {question[:100]}..."
-                            )
-                            context_docs = await self.doc_crud.keyword_search(
-                                question, config.MAX_CONTEXT_CHUNKS
-                            )
+                            except Exception as vector_error:
+                                search_method = "vector_error"
+                                logger.error(f"Vector search failed: {vector_error}")
 
-                            if context_docs:
-                                search_method = "keyword"
+                        if not context_docs:
+                            try:
                                 logger.info(
-                                    f"Keyword search found {len(context_docs)} documents"
+                                    f"Trying keyword search for: {question[:100]}..."
+                                )
+                                context_docs = await self.doc_crud.keyword_search(
+                                    question, config.MAX_CONTEXT_CHUNKS, conn=conn
                                 )
-                        except Exception as keyword_error:
-                            search_method = "keyword_error"
-                            logger.error(f"Keyword search failed: {keyword_error}")
+
+                                if context_docs:
+                                    search_method = "keyword"
+                                    logger.info(
+                                        f"Keyword search found {len(context_docs)} documents"
+                                    )
+                            except Exception as keyword_error:
+                                search_method = "keyword_error"
+                                logger.error(f"Keyword search failed: {keyword_error}")
 
             if use_web_search:
                 try:
@@ -453,18 +464,14 @@ def get_rag_processor_instance() -> RAGProcessor:
     """获取或创建全局 RAGProcessor 单例"""
     global _rag_processor_instance
     if _rag_processor_instance is None:
+        embedding_service = get_embedding_service()
+        search_service = get_search_service()
         _rag_processor_instance = RAGProcessor(
-            embedding_service=EmbeddingService(),
-            search_service=SearchService(),
-            chat_service=ChatService(
-                search_service=SearchService(), embedding_service=EmbeddingService()
-            ),
+            embedding_service=embedding_service,
+            search_service=search_service,
+            chat_service=get_chat_service(search_service, embedding_service),
             common_crud=CommonCRUD(pool=None),  # 初始化时会被覆盖
             doc_crud=DocumentsCRUD(pool=None),
             history_crud=RAGHistoryCRUD(pool=None),
         )
     return _rag_processor_instance
-
-
-# 导出全局单例
-rag_processor = get_rag_processor_instance()
@@ -1,33 +1,104 @@
-import json
+import asyncio
 import logging
-import aiohttp
+from functools import lru_cache
+import httpx
+import orjson
 from typing import List, Dict, Any, Optional
 
 from app.core.config import config
+from app.core.http import http_client_manager
 import dashscope
+from tenacity import (
+    AsyncRetrying,
+    retry_if_exception_type,
+    stop_after_attempt,
+    wait_random_exponential,
+)
 
 logger = logging.getLogger(__name__)
 
+# 可重试的 HTTP 状态码
+TRANSIENT_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class TransientError(Exception):
+    """临时性错误（限流、服务端 5xx、网络错误），可重试"""
+
+
+class PermanentError(Exception):
+    """永久性错误（鉴权失败、参数错误等），重试无意义"""
+
+
+def _classify_error(
+    response: httpx.Response, name: str, code_messages: Dict[str, str]
+) -> Exception:
+    """解析一次错误响应体，按状态码区分可重试与不可重试的错误"""
+    error_msg = f"{name} API error {response.status_code}"
+    try:
+        error_json = orjson.loads(response.content)
+    except orjson.JSONDecodeError:
+        error_json = None
+
+    if isinstance(error_json, dict):
+        if error_json.get("code") in code_messages:
+            return PermanentError(code_messages[error_json["code"]])
+        if "message" in error_json:
+            error_msg = f"{error_msg}: {error_json['message']}"
+
+    if response.status_code in TRANSIENT_STATUS_CODES:
+        return TransientError(error_msg)
+    return PermanentError(error_msg)
+
 
 class SearchService:
     def __init__(self):
         self.api_key = config.DASHSCOPE_API_KEY
         self.base_url = config.DASHSCOPE_BASE_URL
         self.app_base_url = config.DASHSCOPE_APP_BASE_URL
-        self.headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json",
-        }
         self.app_id = config.DASHSCOPE_APP_ID
+        self.chat_url = f"{self.base_url}/chat/completions"
+        self.app_url = f"{self.app_base_url}/apps/{self.app_id}/completion"
+        self.deep_search_url = (
+            f"{self.app_base_url}/v2/apps/deep-search-agent/chat/completions"
+        )
         self.deep_search_agent_id = config.DEEP_SEARCH_AGENT_ID
         self.deep_search_agent_version = config.DEEP_SEARCH_AGENT_VERSION
-        self.timeout = aiohttp.ClientTimeout(total=config.APP_API_TIMEOUT)
+        self.timeout = httpx.Timeout(config.APP_API_TIMEOUT)
 
         dashscope.api_key = self.api_key
 
-    async def _call_bailian_app(self, query: str, **kwargs) -> Dict[str, Any]:
-        app_api_url = f"{self.app_base_url}/apps/{self.app_id}/completion"
+    async def _post_app(
+        self, url: str, data: Dict[str, Any], name: str, code_messages: Dict[str, str]
+    ) -> Dict[str, Any]:
+        """
+        调用百炼应用接口，429 / 5xx 及网络错误按指数退避（带抖动）重试，
+        鉴权、参数等错误直接抛出不重试
+        """
+        client = http_client_manager.get_client()
+        body = orjson.dumps(data)
+
+        async for attempt in AsyncRetrying(
+            stop=stop_after_attempt(3),
+            wait=wait_random_exponential(multiplier=0.1, max=2.0),
+            retry=retry_if_exception_type(TransientError),
+            reraise=True,
+        ):
+            with attempt:
+                try:
+                    response = await client.post(url, content=body, timeout=self.timeout)
+                except httpx.TransportError as e:
+                    raise TransientError(f"{name} request failed: {e}") from e
+
+                if response.status_code == 200:
+                    result = orjson.loads(response.content)
+                    if result.get("output") and result["output"].get("choices"):
+                        return result
+                    logger.error(f"{name} response format error")
+                    raise PermanentError(f"{name} response format error")
 
+                raise _classify_error(response, name, code_messages)
+
+    async def _call_bailian_app(self, query: str, **kwargs) -> Dict[str, Any]:
         data = {
             "input": {"messages": [{"role": "user", "content": query}]},
             "parameters": {
@@ -36,50 +107,23 @@ class SearchService:
             },
         }
 
-        async with aiohttp.ClientSession() as session:
-            async with session.post(
-                app_api_url, headers=self.headers, json=data, timeout=self.timeout
-            ) as response:
-                if response.status == 200:
-                    result = await response.json()
-                    if result.get("output") and result["output"].get("choices"):
-                        content = result["output"]["choices"][0]["message"]["content"]
-                        return {
-                            "content": content,
-                            "search_used": True,
-                            "success": True,
-                        }
-                    else:
-                        logger.error("Bailian App response format error")
-                        raise Exception("Bailian App response format error")
-                else:
-                    error_text = await response.text()
-                    error_msg = f"Bailian App API error {response.status}"
-
-                    try:
-                        error_json = json.loads(error_text)
-                        if "message" in error_json:
-                            error_msg = f"{error_msg}: {error_json['message']}"
-                        if "code" in error_json:
-                            error_code = error_json["code"]
-                            if error_code == "InvalidApiKey":
-                                raise Exception(
-                                    "Invalid API key or insufficient permissions"
-                                )
-                            elif error_code == "QuotaExhausted":
-                                raise Exception("API quota exhausted")
-                            elif error_code == "InvalidParameter":
-                                raise Exception("Invalid app ID or configuration")
-                    except:
-                        pass
-
-                    raise Exception(error_msg)
-
-    async def _call_deep_search_agent(self, query: str, **kwargs) -> Dict[str, Any]:
-        deep_search_url = (
-            f"{self.app_base_url}/v2/apps/deep-search-agent/chat/completions"
+        result = await self._post_app(
+            self.app_url,
+            data,
+            "Bailian App",
+            {
+                "InvalidApiKey": "Invalid API key or insufficient permissions",
+                "QuotaExhausted": "API quota exhausted",
+                "InvalidParameter": "Invalid app ID or configuration",
+            },
         )
+        return {
+            "content": result["output"]["choices"][0]["message"]["content"],
+            "search_used": True,
+            "success": True,
+        }
 
+    async def _call_deep_search_agent(self, query: str, **kwargs) -> Dict[str, Any]:
         data = {
             "input": {"messages": [{"role": "user", "content": query}]},
             "parameters": {
@@ -91,72 +135,67 @@ class SearchService:
             "stream": False,
         }
 
-        async with aiohttp.ClientSession() as session:
-            async with session.post(
-                deep_search_url, headers=self.headers, json=data, timeout=self.timeout
-            ) as response:
-                if response.status == 200:
-                    result = await response.json()
-                    if result.get("output") and result["output"].get("choices"):
-                        content = result["output"]["choices"][0]["message"]["content"]
-                        return {
-                            "content": content,
-                            "search_used": True,
-                            "deep_search": True,
-                            "success": True,
-                        }
-                    else:
-                        logger.error("Deep Search Agent response format error")
-                        raise Exception("Deep Search Agent response format error")
-                else:
-                    error_text = await response.text()
-                    error_msg = f"Deep Search Agent API error {response.status}"
-
-                    try:
-                        error_json = json.loads(error_text)
-                        if "message" in error_json:
-                            error_msg = f"{error_msg}: {error_json['message']}"
-                        if "code" in error_json:
-                            error_code = error_json["code"]
-                            if error_code in ["InvalidApiKey", "AccessDenied"]:
-                                raise Exception(
-                                    "No Deep Search permission for this API key"
-                                )
-                            elif error_code == "QuotaExhausted":
-                                raise Exception("Deep Search quota exhausted")
-                            elif error_code == "InvalidParameter":
-                                raise Exception(
-                                    "Invalid Deep Search agent configuration"
-                                )
-                    except:
-                        pass
-
-                    raise Exception(error_msg)
+        result = await self._post_app(
+            self.deep_search_url,
+            data,
+            "Deep Search Agent",
+            {
+                "InvalidApiKey": "No Deep Search permission for this API key",
+                "AccessDenied": "No Deep Search permission for this API key",
+                "QuotaExhausted": "Deep Search quota exhausted",
+                "InvalidParameter": "Invalid Deep Search agent configuration",
+            },
+        )
+        return {
+            "content": result["output"]["choices"][0]["message"]["content"],
+            "search_used": True,
+            "deep_search": True,
+            "success": True,
+        }
+
+    async def _hedged_bailian_app(
+        self, primary: asyncio.Task, query: str, **kwargs
+    ) -> Dict[str, Any]:
+        """对冲请求：主请求在延迟内失败则立即发起，否则延迟后与主请求并行"""
+        await asyncio.wait({primary}, timeout=config.DEEP_SEARCH_HEDGE_DELAY_MS / 1000)
+        return await self._call_bailian_app(query, **kwargs)
 
     async def deep_search(self, query: str, **kwargs) -> Dict[str, Any]:
         logger.info(f"Executing Deep Search for query: {query[:100]}...")
 
+        primary = asyncio.create_task(self._call_deep_search_agent(query, **kwargs))
+        hedge = asyncio.create_task(self._hedged_bailian_app(primary, query, **kwargs))
+        pending = {primary, hedge}
+        errors = {}
+
         try:
-            return await self._call_deep_search_agent(query, **kwargs)
-        except Exception as e:
-            logger.error(f"Deep Search Agent failed: {e}")
-
-            try:
-                fallback_result = await self._call_bailian_app(query, **kwargs)
-                logger.info("Fell back to regular Bailian App search")
-                return fallback_result
-            except Exception as fallback_error:
-                logger.error(f"All search methods failed: {fallback_error}")
-
-                content = await self._fallback_chat_completion(query, **kwargs)
-
-                return {
-                    "content": f"Search services encountered issues, using model knowledge:\n\n{content}",
-                    "search_used": False,
-                    "deep_search": False,
-                    "success": True,
-                    "error": str(e),
-                }
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                # 同时完成时优先使用 Deep Search 的结果
+                for task in sorted(done, key=lambda t: t is not primary):
+                    if task.exception() is None:
+                        if task is hedge:
+                            logger.info("Fell back to regular Bailian App search")
+                        return task.result()
+                    errors[task] = task.exception()
+                    name = "Deep Search Agent" if task is primary else "Bailian App"
+                    logger.error(f"{name} failed: {task.exception()}")
+        finally:
+            for task in pending:
+                task.cancel()
+
+        logger.error("All search methods failed")
+        content = await self._fallback_chat_completion(query, **kwargs)
+
+        return {
+            "content": f"Search services encountered issues, using model knowledge:\n\n{content}",
+            "search_used": False,
+            "deep_search": False,
+            "success": True,
+            "error": str(errors.get(primary)),
+        }
 
     async def _fallback_chat_completion(self, query: str, **kwargs) -> str:
         """降级到直接聊天完成"""
@@ -168,23 +207,23 @@ class SearchService:
             "temperature": kwargs.get("temperature", 0.7),
         }
 
-        async with aiohttp.ClientSession() as session:
-            async with session.post(
-                f"{self.base_url}/chat/completions",
-                headers=self.headers,
-                json=data,
-                timeout=self.timeout,
-            ) as response:
-                if response.status == 200:
-                    result = await response.json()
-                    return result["choices"][0]["message"]["content"]
-                else:
-                    error_text = await response.text()
-                    raise Exception(
-                        f"Fallback chat error {response.status}: {error_text}"
-                    )
-
-
-# 注入工厂
+        client = http_client_manager.get_client()
+        response = await client.post(
+            self.chat_url,
+            content=orjson.dumps(data),
+            timeout=self.timeout,
+        )
+        if response.status_code == 200:
+            result = orjson.loads(response.content)
+            return result["choices"][0]["message"]["content"]
+        else:
+            error_text = response.text
+            raise Exception(
+                f"Fallback chat error {response.status_code}: {error_text}"
+            )
+
+
+# 注入工厂：进程内单例，首次注入时才构建（而不是在 import 时）
+@lru_cache(maxsize=1)
 def get_search_service() -> SearchService:
     return SearchService()
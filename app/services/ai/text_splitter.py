@@ -0,0 +1,46 @@
+import logging
+from functools import lru_cache
+from typing import List
+
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from app.services.ai.token_counter import count_tokens
+
+logger = logging.getLogger(__name__)
+
+# 按 token 计的分块参数
+CHUNK_TOKENS = 200
+CHUNK_OVERLAP_TOKENS = 20
+# 小于该 token 数的分块并入前一块
+MIN_CHUNK_TOKENS = 100
+
+# 切分优先级：段落 → 行 → 句子 → 空白
+SEPARATORS = ["\n\n", "\n", "。", "！", "？", ". ", " ", ""]
+
+
+@lru_cache(maxsize=1)
+def get_text_splitter() -> RecursiveCharacterTextSplitter:
+    """递归、按 token 计长的文本切分器（进程内单例）"""
+    return RecursiveCharacterTextSplitter(
+        chunk_size=CHUNK_TOKENS,
+        chunk_overlap=CHUNK_OVERLAP_TOKENS,
+        separators=SEPARATORS,
+        keep_separator="end",
+        length_function=count_tokens,
+    )
+
+
+def merge_small_chunks(chunks: List[str]) -> List[str]:
+    """把过短的分块（通常是段落尾巴）并入前一块，减少低信息量的向量"""
+    merged: List[str] = []
+    for chunk in chunks:
+        if merged and count_tokens(chunk) < MIN_CHUNK_TOKENS:
+            merged[-1] = f"{merged[-1]}\n{chunk}"
+        else:
+            merged.append(chunk)
+    return merged
+
+
+def split_text(text: str) -> List[str]:
+    """切分文本并合并过短的尾块"""
+    return merge_small_chunks(get_text_splitter().split_text(text))
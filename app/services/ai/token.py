@@ -1,3 +1,3 @@
-def count_tokens(text: str) -> int:
-    return max(1, len(text) // 4)
+from app.services.ai.token_counter import count_tokens, count_tokens_batch
 
+__all__ = ["count_tokens", "count_tokens_batch"]
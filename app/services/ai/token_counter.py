@@ -1,3 +1,49 @@
-def count_tokens(text: str) -> int:
+import logging
+from functools import lru_cache
+from typing import List
+
+logger = logging.getLogger(__name__)
+
+try:
+    import tiktoken
+    _has_tiktoken = True
+except ImportError:
+    _has_tiktoken = False
+    tiktoken = None
+
+ENCODING_NAME = "cl100k_base"
+
+
+@lru_cache(maxsize=1)
+def _get_encoding():
+    """延迟加载编码器（首次使用时可能需要下载 BPE 文件）"""
+    if not _has_tiktoken:
+        return None
+    try:
+        return tiktoken.get_encoding(ENCODING_NAME)
+    except Exception as e:
+        logger.warning(f"Failed to load tiktoken encoding, using heuristic: {e}")
+        return None
+
+
+def _estimate_tokens(text: str) -> int:
     return max(1, len(text) // 4)
 
+
+def count_tokens(text: str) -> int:
+    """统计 token 数（CPU 密集，长文本应放到线程池执行）"""
+    encoding = _get_encoding()
+    if encoding is None:
+        return _estimate_tokens(text)
+    return max(1, len(encoding.encode(text, disallowed_special=())))
+
+
+def count_tokens_batch(texts: List[str]) -> List[int]:
+    """批量统计 token 数，encode_batch 在 C 层并行执行"""
+    encoding = _get_encoding()
+    if encoding is None:
+        return [_estimate_tokens(text) for text in texts]
+    return [
+        max(1, len(tokens))
+        for tokens in encoding.encode_batch(texts, disallowed_special=())
+    ]
@@ -1,16 +1,18 @@
 from datetime import datetime
+import hashlib
 import logging
 
+import orjson
+
 from fastapi import Depends
 from langgraph.graph.state import CompiledStateGraph
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.core.dependencies import get_db
+from app.core.dependencies import get_db, get_db_ro
 from app.models.chat_info import ChatSession, ChatMessage
 from app.services.ai.agent_graph import get_gal_agent
 from app.utils.utils import UUIDUtil, SSEUtil
 from app.crud.chat_info import chat_session_crud, chat_message_crud
 from app.utils.constants import EventType, ChatRole
-from app.schemas.chat_info import ChatHistoryMessagesResponse
 
 logger = logging.getLogger(__name__)
 
@@ -34,35 +36,25 @@ def get_chat_session_service(
     return ChatSessionService(db)
 
 
-async def build_history_message(
-        chat_session: ChatSession, chat_messages: list[ChatMessage]
-) -> ChatHistoryMessagesResponse:
-    from app.schemas.chat_info import ChatSession as ChatSessionSchema
-    from app.schemas.chat_info import ChatMessage as ChatMessageSchema
-
-    chat_session_schema = ChatSessionSchema(
-        id=chat_session.chat_session_code,
-        updated_at=chat_session.update_time,
-        version=chat_session.current_message_id,
-        current_message_id=chat_session.current_message_id,
-        inserted_at=chat_session.create_time,
-    )
-
-    chat_messages_schema = [
-        ChatMessageSchema(
-            message_id=msg.message_id,
-            parent_id=msg.parent_id,
-            role=ChatRole(msg.role),
-            message_content=msg.message,
-            accumulated_token_usage=0,
-            inserted_at=msg.create_time,
-        )
-        for msg in chat_messages
-    ]
+def _history_session_item(chat_session: ChatSession) -> dict:
+    return {
+        "id": chat_session.chat_session_code,
+        "updated_at": chat_session.update_time,
+        "version": chat_session.current_message_id,
+        "current_message_id": chat_session.current_message_id,
+        "inserted_at": chat_session.create_time,
+    }
+
 
-    return ChatHistoryMessagesResponse(
-        chat_session=chat_session_schema, chat_messages=chat_messages_schema
-    )
+def _history_message_item(msg: ChatMessage) -> dict:
+    return {
+        "message_id": msg.message_id,
+        "parent_id": msg.parent_id,
+        "role": ChatRole(msg.role),
+        "accumulated_token_usage": 0,
+        "message_content": msg.message,
+        "inserted_at": msg.create_time,
+    }
 
 
 class ChatMessageService:
@@ -70,7 +62,8 @@ class ChatMessageService:
         self.db = db
         self.agent = agent
 
-    async def get_history_message(self, session_code: str):
+    async def get_history_version(self, session_code: str):
+        """获取会话及其历史消息的 ETag，消息新增或内容更新后 ETag 随之变化"""
         logger.info(f"获取会话编码为：{session_code}的历史消息")
         chat_session = await chat_session_crud.get_by_session_code(
             self.db, session_code
@@ -78,18 +71,62 @@ class ChatMessageService:
         if not chat_session:
             logger.error(f"会话编码为：{session_code}的会话不存在")
             raise Exception("会话不存在")
-        
-        chat_messages: list = await chat_message_crud.get_all_messages_of_session(
+
+        count, last_update = await chat_message_crud.get_messages_version(
             self.db, chat_session.id
         )
-        if not chat_messages:
-            logger.info(f"会话编码为：{session_code}的会话没有历史消息")
-            chat_messages = []
-        
-        return await build_history_message(chat_session, chat_messages)
+        version = f"{chat_session.id}:{chat_session.current_message_id}:{count}:{last_update}"
+        etag = f'"{hashlib.blake2b(version.encode(), digest_size=8).hexdigest()}"'
+        return chat_session, etag
+
+    async def stream_history_message(self, chat_session: ChatSession):
+        """
+        分批输出历史消息 JSON
+
+        响应体与 success_response 包装 ChatHistoryMessagesResponse 的结果一致，
+        消息按服务端游标每批序列化后立即写出，长会话不再整体驻留内存。
+        """
+        envelope = orjson.dumps({"code": 200, "message": "获取历史消息成功"})
+        yield (
+            envelope[:-1]
+            + b',"data":{"chat_session":'
+            + orjson.dumps(_history_session_item(chat_session))
+            + b',"chat_messages":['
+        )
+
+        messages = await chat_message_crud.stream_all_messages_of_session(
+            self.db, chat_session.id
+        )
+        separator = b""
+        async for partition in messages.partitions():
+            yield separator + b",".join(orjson.dumps(_history_message_item(msg)) for msg in partition)
+            separator = b","
+
+        yield b"]}}"
 
     async def chat(self, session_code: str, ask_text: str):
-        """单表模式：不再使用 topic 参数"""
+        """SSE 流式输出（单表模式：不再使用 topic 参数）"""
+        async for event, data in self.chat_events(session_code, ask_text):
+            yield SSEUtil.format_sse(event=event, data=data)
+
+    @staticmethod
+    def _retrieval_items(tool_call) -> list:
+        """从 retrieve_documents 工具结果中取出检索条目"""
+        if tool_call.get("name") != "retrieve_documents":
+            return []
+        result = tool_call.get("result") or tool_call.get("output")
+        if not result:
+            return []
+        try:
+            parsed = orjson.loads(result)
+        except orjson.JSONDecodeError as e:
+            logger.warning(f"检索工具结果解析失败: {e}")
+            return []
+        items = parsed.get("items") if isinstance(parsed, dict) else None
+        return items or []
+
+    async def chat_events(self, session_code: str, ask_text: str):
+        """对话事件流，产出 (事件类型, 数据)，由 chat 转成 SSE 或由调用方直接消费"""
         # --- 事件 1 ready ---
         chat_session_info: ChatSession = await chat_session_crud.get_by_session_code(
             self.db, session_code
@@ -120,32 +157,22 @@ class ChatMessageService:
         else:
             logger.info("没有历史消息，这是新会话的第一条消息")
 
-        yield SSEUtil.format_sse(
-            event=EventType.READY,
-            data={
-                "request_message_id": next_message_id,
-                "response_message_id": next_message_id + 1,
-            },
-        )
+        yield EventType.READY, {
+            "request_message_id": next_message_id,
+            "response_message_id": next_message_id + 1,
+        }
 
         # --- 事件 2 update_session ---
-        user_message_id = await chat_message_crud.insert_user_message(
+        user_message_id, ai_message_id = await chat_message_crud.insert_message_pair(
             self.db, chat_session_info, current_message_id, ask_text
         )
-        logger.info(f"插入用户消息成功，ID: {user_message_id}")
-
-        ai_message_id: int = await chat_message_crud.insert_ai_message(
-            self.db, chat_session_info, next_message_id, None
-        )
-        logger.info(f"插入AI消息成功，ID: {ai_message_id}")
+        logger.info(f"插入用户消息成功，ID: {user_message_id}；插入AI消息成功，ID: {ai_message_id}")
 
         await chat_session_crud.update_message_id(
             self.db, chat_session_info.id, next_message_id + 1
         )
 
-        yield SSEUtil.format_sse(
-            event=EventType.UPDATE_SESSION, data={"updated_at": datetime.now()}
-        )
+        yield EventType.UPDATE_SESSION, {"updated_at": datetime.now()}
 
         # --- 事件 3 AI 内容流 ---
         full_response = ""
@@ -188,52 +215,33 @@ class ChatMessageService:
                             new_content = last_message.content[len(full_response):]
                             if new_content:
                                 full_response = last_message.content
-                                yield SSEUtil.format_sse(
-                                    event=EventType.MESSAGE,
-                                    data={"content": new_content}
-                                )
+                                yield EventType.MESSAGE, {"content": new_content}
 
                 if "tools" in node_data:
                     for tool_call in node_data["tools"]:
-                        try:
-                            tool_name = tool_call.get("name")
-                            result = tool_call.get("result") or tool_call.get("output")
-                            if tool_name == "retrieve_documents" and result:
-                                import json as _json
-                                try:
-                                    parsed = _json.loads(result)
-                                    items = parsed.get("items") if isinstance(parsed, dict) else None
-                                    if items:
-                                        for item in items:
-                                            yield SSEUtil.format_sse(
-                                                event=EventType.RETRIEVAL,
-                                                data=item,
-                                            )
-                                        continue
-                                except Exception:
-                                    pass
-                        except Exception:
-                            pass
-
-                        yield SSEUtil.format_sse(
-                            event=EventType.REASONING,
-                            data={"tool": tool_call.get("name"), "status": "calling"}
-                        )
+                        items = self._retrieval_items(tool_call)
+                        if items:
+                            for item in items:
+                                yield EventType.RETRIEVAL, item
+                            continue
+
+                        yield EventType.REASONING, {
+                            "tool": tool_call.get("name"),
+                            "status": "calling",
+                        }
 
         # --- 事件 4 finish ---
-        yield SSEUtil.format_sse(event=EventType.FINISH, data={})
+        yield EventType.FINISH, {}
 
         logger.info(f"AI回复为：{full_response[:100]}...")
 
         # --- 事件 5 update_session ---
         await chat_message_crud.update_message(self.db, ai_message_id, full_response)
         await self.db.commit()
-        yield SSEUtil.format_sse(
-            event=EventType.UPDATE_SESSION, data={"updated_at": datetime.now()}
-        )
+        yield EventType.UPDATE_SESSION, {"updated_at": datetime.now()}
 
         # --- 事件 6 close ---
-        yield SSEUtil.format_sse(event=EventType.CLOSE, data={"click_behavior": "none"})
+        yield EventType.CLOSE, {"click_behavior": "none"}
 
 
 # 注入工厂
@@ -242,3 +250,11 @@ def get_chat_message_service(
         agent: CompiledStateGraph = Depends(get_gal_agent),
 ) -> ChatMessageService:
     return ChatMessageService(db, agent)
+
+
+# 注入工厂（只读接口）
+def get_chat_message_service_ro(
+        db: AsyncSession = Depends(get_db_ro),
+        agent: CompiledStateGraph = Depends(get_gal_agent),
+) -> ChatMessageService:
+    return ChatMessageService(db, agent)
@@ -0,0 +1,96 @@
+import asyncio
+import hashlib
+import logging
+from typing import List, Sequence
+
+from fastapi.concurrency import run_in_threadpool
+from langchain_core.documents import Document
+from langchain_core.vectorstores import VectorStore
+
+from app.services.ai.query_cache import query_cache
+from app.services.ai.token_counter import count_tokens_batch
+from app.services.retrieval_cache import retrieval_cache
+
+logger = logging.getLogger(__name__)
+
+
+def _split_by_token_budget(
+    docs: Sequence[Document], token_budget: int
+) -> List[List[Document]]:
+    """按 token 总量把文档切成若干批，单个超预算的文档独占一批"""
+    batches: List[List[Document]] = []
+    batch: List[Document] = []
+    batch_tokens = 0
+
+    token_counts = count_tokens_batch([doc.page_content for doc in docs])
+    for doc, tokens in zip(docs, token_counts):
+        if batch and batch_tokens + tokens > token_budget:
+            batches.append(batch)
+            batch, batch_tokens = [], 0
+        batch.append(doc)
+        batch_tokens += tokens
+
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+def content_id(text: str) -> str:
+    """按内容生成稳定的文档 id，相同内容重复上传时 id 相同"""
+    return hashlib.blake2b(text.encode(), digest_size=16).hexdigest()
+
+
+async def _filter_existing(vs: VectorStore, docs: Sequence[Document]) -> List[Document]:
+    """给文档设置内容 id，并去掉库中已存在或本批内重复的文档"""
+    for doc in docs:
+        doc.id = content_id(doc.page_content)
+
+    unique_ids = list({doc.id for doc in docs})
+    seen = {doc.id for doc in await vs.aget_by_ids(unique_ids)}
+
+    new_docs = []
+    for doc in docs:
+        if doc.id not in seen:
+            seen.add(doc.id)
+            new_docs.append(doc)
+    return new_docs
+
+
+async def aadd_batched(
+    vs: VectorStore,
+    docs: Sequence[Document],
+    token_budget: int = 8000,
+    max_concurrency: int = 4,
+    skip_existing: bool = False,
+) -> List[str]:
+    """
+    按 token 预算分批写入向量库，批次之间有限并发
+
+    每批的 embedding 请求大小相近，p95 延迟更稳定；返回的 id 顺序与 docs 一致。
+    skip_existing=True 时以内容哈希作为 id，已入库的分块不再计算 embedding。
+    """
+    if not docs:
+        return []
+
+    to_add = await _filter_existing(vs, docs) if skip_existing else docs
+    # 批量分词是 CPU 密集操作，放到线程池执行，不阻塞事件循环
+    batches = await run_in_threadpool(_split_by_token_budget, to_add, token_budget)
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def _add(batch: List[Document]) -> List[str]:
+        async with semaphore:
+            if skip_existing:
+                return await vs.aadd_documents(batch, ids=[doc.id for doc in batch])
+            return await vs.aadd_documents(batch)
+
+    results = await asyncio.gather(*(_add(batch) for batch in batches))
+    if to_add:
+        # 知识库内容变化，已缓存的检索结果和 /ask 回答失效
+        retrieval_cache.invalidate()
+        query_cache.clear()
+    logger.info(
+        f"Added {len(to_add)}/{len(docs)} documents in {len(batches)} token-budgeted batches"
+    )
+    if skip_existing:
+        return [doc.id for doc in docs]
+    return [doc_id for ids in results for doc_id in ids]
@@ -0,0 +1,106 @@
+"""
+知识库检索结果缓存
+
+智能体的 ReAct 循环经常重复相同的检索（改写后再试），命中缓存时
+跳过 embedding、向量检索和重排整条链路。知识库有新文档写入时
+递增代数（generation），旧结果随即全部失效。
+"""
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+from app.core.config import config
+
+logger = logging.getLogger(__name__)
+
+
+class RetrievalCache:
+    """检索结果的 LRU + TTL 缓存，并发的相同查询只执行一次检索"""
+
+    def __init__(self, maxsize: int = 512, ttl: float = 60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._cache: "OrderedDict[Hashable, Tuple[str, float]]" = OrderedDict()
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self._generation = 0
+
+    def make_key(self, *parts: Hashable) -> Tuple[Hashable, ...]:
+        # 代数写进 key：失效后旧代的进行中请求也不会写回新代
+        return (self._generation, *parts)
+
+    def get(self, key: Hashable) -> Optional[str]:
+        item = self._cache.get(key)
+        if item is None:
+            return None
+        value, created_at = item
+        if time.monotonic() - created_at > self.ttl:
+            del self._cache[key]
+            return None
+        self._cache.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: str):
+        if key[0] != self._generation:
+            return
+        self._cache[key] = (value, time.monotonic())
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.maxsize:
+            self._cache.popitem(last=False)
+
+    async def get_or_compute(
+        self,
+        key: Hashable,
+        compute: Callable[[], Awaitable[Tuple[str, bool]]],
+    ) -> str:
+        """
+        命中则直接返回；否则执行 compute，返回 (结果, 是否可缓存)
+
+        同一 key 的并发调用共享一次 compute，出错的结果不写入缓存。
+        """
+        cached = self.get(key)
+        if cached is not None:
+            return cached
+
+        task = self._inflight.get(key)
+        if task is None:
+            # 检索放在独立任务中，发起方被取消时不会连带取消其他等待方
+            task = asyncio.ensure_future(self._compute_and_store(key, compute))
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._finish_inflight(key, t))
+
+        # shield：任一调用方被取消只影响它自己，检索照常完成并写入缓存
+        return await asyncio.shield(task)
+
+    async def _compute_and_store(
+        self,
+        key: Hashable,
+        compute: Callable[[], Awaitable[Tuple[str, bool]]],
+    ) -> str:
+        value, cacheable = await compute()
+        if cacheable:
+            self.set(key, value)
+        return value
+
+    def _finish_inflight(self, key: Hashable, task: asyncio.Future):
+        self._inflight.pop(key, None)
+        # 所有调用方都已取消时也标记异常已读取，避免 "exception was never retrieved" 日志
+        if not task.cancelled():
+            task.exception()
+
+    def invalidate(self):
+        """知识库内容变化后调用，之前缓存的检索结果全部失效"""
+        self._generation += 1
+        self._cache.clear()
+        logger.debug(f"Retrieval cache invalidated (generation={self._generation})")
+
+    def __len__(self):
+        return len(self._cache)
+
+
+# 全局缓存实例
+retrieval_cache = RetrievalCache(
+    maxsize=config.RETRIEVAL_CACHE_SIZE,
+    ttl=config.RETRIEVAL_CACHE_TTL,
+)
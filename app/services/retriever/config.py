@@ -44,6 +44,9 @@ class RecursiveRetrieverConfig:
     num_sub_questions: int = 2
     """每层生成的子问题数量"""
     
+    max_concurrency: int = 8
+    """同层子问题并发检索的上限（避免占满数据库连接池）"""
+    
     # 重排序参数
     enable_reranking: bool = True
     """是否在各层进行重排序"""
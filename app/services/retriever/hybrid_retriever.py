@@ -9,10 +9,13 @@ from typing import Dict, List, Optional, Tuple, Any
 from dataclasses import dataclass
 from datetime import datetime
 
+import numpy as np
+
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, and_, or_, func, text
 from sqlalchemy.orm import joinedload
 
+from app.core.config import config
 from app.models.document import Document, DocumentTagCache, DocumentEmbeddingIndex
 
 logger = logging.getLogger(__name__)
@@ -208,10 +211,20 @@ class HybridRetriever:
             List[（document_id, similarity_score）]
         """
         try:
-            # 使用 PostgreSQL 的向量余弦相似度操作符
+            # HNSW 检索候选集大小，仅在当前事务内生效（等同 SET LOCAL）
+            await self.db.execute(
+                select(func.set_config("hnsw.ef_search", str(config.HNSW_EF_SEARCH), True))
+            )
+
+            # 库中向量已归一化，查询向量同样归一化后，负内积（<#>）即负的余弦相似度
+            query_vector = np.asarray(embedding, dtype=np.float32)
+            norm = float(np.linalg.norm(query_vector))
+            if norm:
+                query_vector = query_vector / norm
+
             query = select(
                 Document.id,
-                (Document.embedding.cosine_distance(embedding)).label("distance")
+                (Document.embedding.max_inner_product(query_vector)).label("distance")
             ).where(
                 Document.is_indexed == True
             ).order_by("distance").limit(top_k)
@@ -219,10 +232,9 @@ class HybridRetriever:
             result = await self.db.execute(query)
             rows = result.fetchall()
             
-            # 将距离转换为相似度评分（距离越小=相似度越高）
-            # 相似度 = 1 - 距离（假设距离在0-2之间）
+            # 将距离转换为相似度评分：相似度 = -(<#> 的结果)
             results = [
-                (doc_id, max(0.0, 1.0 - float(distance)))
+                (doc_id, max(0.0, -float(distance)))
                 for doc_id, distance in rows
             ]
             
@@ -323,21 +335,17 @@ class HybridRetriever:
             conditions = []
             matched_tag_lists = []
             
+            # 数组包含检查（categories @> ARRAY['x']），可以命中 GIN 索引
             if "categories" in tag_filters:
                 categories = tag_filters["categories"]
-                # JSONB 包含检查
                 for cat in categories:
-                    conditions.append(
-                        func.jsonb_array_elements_text(DocumentTagCache.categories) == cat
-                    )
+                    conditions.append(DocumentTagCache.categories.contains([cat]))
                 matched_tag_lists.append(categories)
             
             if "domains" in tag_filters:
                 domains = tag_filters["domains"]
                 for domain in domains:
-                    conditions.append(
-                        func.jsonb_array_elements_text(DocumentTagCache.domains) == domain
-                    )
+                    conditions.append(DocumentTagCache.domains.contains([domain]))
                 matched_tag_lists.append(domains)
             
             if "difficulty" in tag_filters:
@@ -352,7 +360,7 @@ class HybridRetriever:
             query = select(
                 DocumentTagCache.document_id,
                 DocumentTagCache.importance,
-                func.array_agg(DocumentTagCache.domains).label("matched_tags")
+                DocumentTagCache.domains.label("matched_tags")
             ).where(
                 or_(*conditions)
             ).order_by(
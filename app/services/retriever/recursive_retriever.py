@@ -9,13 +9,13 @@
 5. 结果合并 → 去重并重排序 → 返回 top_n
 """
 
+import asyncio
 import logging
 import numpy as np
 from typing import List, Dict, Optional, Tuple, Any
 from dataclasses import dataclass, field
 from datetime import datetime
 from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
 
 from app.core.langchain import langchain_manager
 from app.core.config import config
@@ -60,6 +60,7 @@ class RecursiveRetriever:
         self._total_queries = 0
         self._total_documents = 0
         self._attempted_queries = set()
+        self._search_semaphore = asyncio.Semaphore(self.config.max_concurrency)
         
     def set_vectorstore(self, vectorstore):
         """设置向量数据库"""
@@ -115,21 +116,44 @@ class RecursiveRetriever:
         
         return result_dicts, None
     
-    async def _single_retrieve(self, query: str, k: int) -> List[Any]:
-        """单层检索 - 单表模式"""
+    async def _single_retrieve(
+        self, query: str, k: int, embedding: Optional[List[float]] = None
+    ) -> List[Any]:
+        """单层检索 - 单表模式；传入已算好的 embedding 时直接按向量检索"""
         try:
             vs = self.vectorstore or langchain_manager.get_vectorstore()
-            docs = await vs.asimilarity_search(query, k=k)
+            async with self._search_semaphore:
+                if embedding is not None:
+                    return await vs.asimilarity_search_by_vector(embedding, k=k)
+                docs = await vs.asimilarity_search(query, k=k)
             return docs
         except Exception as e:
             self.logger.error(f"单层检索失败: {e}")
             return []
     
+    async def _embed_queries(self, queries: List[str]) -> List[Optional[List[float]]]:
+        """同层子问题并发计算查询 embedding；失败的子问题退回各自检索时再计算"""
+        vs = self.vectorstore or langchain_manager.get_vectorstore()
+        # 子问题是查询而不是文档，必须走 aembed_query（部分模型两者前缀不同）
+        embeddings = await asyncio.gather(
+            *(vs.embeddings.aembed_query(q) for q in queries),
+            return_exceptions=True,
+        )
+        results: List[Optional[List[float]]] = []
+        for embedding in embeddings:
+            if isinstance(embedding, BaseException):
+                self.logger.warning(f"子问题向量化失败: {embedding}")
+                results.append(None)
+            else:
+                results.append(embedding)
+        return results
+    
     async def _recursive_retrieve(
         self,
         query: str,
         depth: int,
         parent_query: str,
+        embedding: Optional[List[float]] = None,
     ) -> Tuple[List[RetrievalResult], Dict[str, Any]]:
         """递归检索核心算法"""
         if self._total_queries >= self.config.max_query_attempts:
@@ -149,7 +173,9 @@ class RecursiveRetriever:
             return [], {"depth": depth, "query": query, "status": "max_depth_reached"}
         
         k = self.config.initial_k if depth == 1 else self.config.intermediate_k
-        docs = await self._single_retrieve(query, k)
+        docs = await self._single_retrieve(query, k, embedding)
+        # 兄弟节点并发检索，返回时按剩余文档额度截断，总数不超过 max_total_documents
+        docs = docs[: max(0, self.config.max_total_documents - self._total_documents)]
         self._total_documents += len(docs)
         
         if not docs:
@@ -176,14 +202,33 @@ class RecursiveRetriever:
         )
         
         if should_recurse:
-            sub_questions = await self._generate_sub_questions(query, results, self.config.num_sub_questions)
+            # 并发前先按剩余的查询次数和文档额度预留，只发起预算内的子问题
+            remaining_queries = self.config.max_query_attempts - self._total_queries
+            remaining_documents = self.config.max_total_documents - self._total_documents
+            num_sub_questions = min(
+                self.config.num_sub_questions,
+                remaining_queries,
+                -(-remaining_documents // max(1, self.config.intermediate_k)),
+            )
+            sub_questions = await self._generate_sub_questions(query, results, num_sub_questions)
+            sub_questions = sub_questions[:num_sub_questions]
+            sub_embeddings = await self._embed_queries(sub_questions) if sub_questions else []
             
-            for sub_query in sub_questions:
-                if (self._total_queries >= self.config.max_query_attempts or
-                    self._total_documents >= self.config.max_total_documents):
-                    break
-                
-                sub_results, sub_tree = await self._recursive_retrieve(sub_query, depth=depth + 1, parent_query=query)
+            # 同层子问题并发检索，整棵树的延迟从 O(深度×分支) 降到约 O(深度) 次往返
+            children = await asyncio.gather(
+                *(
+                    self._recursive_retrieve(
+                        sub_query, depth=depth + 1, parent_query=query, embedding=sub_embedding
+                    )
+                    for sub_query, sub_embedding in zip(sub_questions, sub_embeddings)
+                ),
+                return_exceptions=True,
+            )
+            for sub_query, child in zip(sub_questions, children):
+                if isinstance(child, Exception):
+                    self.logger.error(f"子问题检索失败: {sub_query}: {child}")
+                    continue
+                sub_results, sub_tree = child
                 results.extend(sub_results)
                 tree["children"].append(sub_tree)
         
@@ -289,7 +334,10 @@ class RecursiveRetriever:
         try:
             vectorizer = TfidfVectorizer(analyzer='char', ngram_range=(1, 2))
             tfidf_matrix = vectorizer.fit_transform(contents)
-            similarity_matrix = cosine_similarity(tfidf_matrix)
+            # TfidfVectorizer 输出的行已做 L2 归一化，稀疏矩阵自乘即为余弦相似度
+            similarity_matrix = (tfidf_matrix @ tfidf_matrix.T).toarray()
+            duplicates = similarity_matrix > self.config.deduplication_threshold
+            np.fill_diagonal(duplicates, False)
             
             kept = []
             used = set()
@@ -305,10 +353,7 @@ class RecursiveRetriever:
                     continue
                 
                 kept.append(results[idx])
-                
-                for other_idx in range(len(results)):
-                    if other_idx != idx and similarity_matrix[idx][other_idx] > self.config.deduplication_threshold:
-                        used.add(other_idx)
+                used.update(np.flatnonzero(duplicates[idx]).tolist())
             
             return kept
         
@@ -340,7 +385,7 @@ class RecursiveRetriever:
             
             query_vector = tfidf_matrix[0:1]
             doc_vectors = tfidf_matrix[1:]
-            similarities = cosine_similarity(query_vector, doc_vectors)[0]
+            similarities = (doc_vectors @ query_vector.T).toarray().ravel()
             
             for i, sim_score in enumerate(similarities):
                 results[i].relevance_score = 0.4 * results[i].relevance_score + 0.6 * sim_score
@@ -0,0 +1,200 @@
+"""
+文档上传后台任务
+
+/upload 只负责把文件转存并入队，立即返回 job_id；切分、embedding 和入库
+由 lifespan 中启动的 worker 异步完成，客户端通过 GET /upload/{job_id} 查询进度。
+"""
+import asyncio
+import codecs
+import logging
+import tempfile
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import uuid6
+from fastapi import UploadFile
+from fastapi.concurrency import run_in_threadpool
+from langchain_core.documents import Document
+from langchain_core.vectorstores import VectorStore
+
+from app.core.config import config
+from app.services.ai.text_splitter import split_text
+from app.services.embed_batcher import aadd_batched
+
+logger = logging.getLogger(__name__)
+
+# 每次读取的字节数
+UPLOAD_READ_SIZE = 1 << 20
+# 小于该大小的上传只保存在内存中，超过后才落盘
+UPLOAD_SPOOL_MAX_SIZE = 8 << 20
+# 每攒够这么多文档交给 aadd_batched，再按 token 预算拆批并发写入
+UPLOAD_BATCH_SIZE = 256
+# 最多保留的任务记录数（超出后淘汰最早结束的任务）
+MAX_JOB_RECORDS = 1000
+
+
+def _split_block(decoder, buffer: str, block: bytes):
+    """
+    解码一个数据块并按 token 递归切分，返回 (可输出的分块, 剩余文本)
+
+    最后一块可能被数据块边界截断，留作剩余文本与下一个数据块一起重新切分。
+    """
+    buffer += decoder.decode(block, final=not block)
+    chunks = split_text(buffer) if buffer else []
+    if not block or not chunks:
+        return chunks, ""
+    return chunks[:-1], chunks[-1]
+
+
+async def iter_text_chunks(read: Callable[[int], Awaitable[bytes]]):
+    """分块读取并增量解码，边读边产出切分好的文本块"""
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    buffer = ""
+    while True:
+        block = await read(UPLOAD_READ_SIZE)
+        # 解码和切分放到线程池执行，避免大文件阻塞事件循环
+        chunks, buffer = await run_in_threadpool(_split_block, decoder, buffer, block)
+        for chunk in chunks:
+            yield chunk
+        if not block:
+            break
+
+
+class UploadJobManager:
+    """上传任务队列及其 worker"""
+
+    def __init__(self, num_workers: int = 2):
+        self.num_workers = num_workers
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        self._jobs: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+
+    def start(self):
+        """在事件循环中启动 worker（lifespan 启动阶段调用）"""
+        if self._workers:
+            return
+        self._queue = asyncio.Queue()
+        self._workers = [
+            asyncio.create_task(self._worker(i)) for i in range(self.num_workers)
+        ]
+        logger.info(f"Started {self.num_workers} upload workers")
+
+    async def stop(self):
+        """停止 worker，未处理的任务临时文件一并清理"""
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+        while self._queue is not None and not self._queue.empty():
+            job_id, spool, _ = self._queue.get_nowait()
+            self._update(job_id, status="failed", error="Server shutting down")
+            spool.close()
+        self._queue = None
+
+    async def submit(self, file: UploadFile, vectorstore: VectorStore) -> Dict[str, Any]:
+        """
+        把上传内容转存并入队，返回任务信息
+
+        小文件留在内存中；超过 UPLOAD_SPOOL_MAX_SIZE 后转为匿名临时文件
+        （Linux 上使用 O_TMPFILE），关闭即回收，无需 unlink。
+        """
+        if self._queue is None:
+            raise RuntimeError("Upload workers are not running")
+
+        spool = tempfile.SpooledTemporaryFile(max_size=UPLOAD_SPOOL_MAX_SIZE)
+        try:
+            while block := await file.read(UPLOAD_READ_SIZE):
+                await run_in_threadpool(spool.write, block)
+            spool.seek(0)
+        except Exception:
+            spool.close()
+            raise
+
+        job_id = str(uuid6.uuid7())
+        job = {
+            "job_id": job_id,
+            "status": "queued",
+            "filename": file.filename,
+            "file_type": file.content_type,
+            "chunks_done": 0,
+            "document_ids": [],
+            "error": None,
+            "created_at": time.time(),
+            "finished_at": None,
+        }
+        self._jobs[job_id] = job
+        self._evict()
+
+        await self._queue.put((job_id, spool, vectorstore))
+        return job
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return self._jobs.get(job_id)
+
+    def _update(self, job_id: str, **fields):
+        job = self._jobs.get(job_id)
+        if job is not None:
+            job.update(fields)
+
+    def _evict(self):
+        # 只淘汰已结束的任务，排队和处理中的任务始终可查
+        if len(self._jobs) <= MAX_JOB_RECORDS:
+            return
+        for job_id in [
+            job_id for job_id, job in self._jobs.items()
+            if job["status"] in ("completed", "failed")
+        ][: len(self._jobs) - MAX_JOB_RECORDS]:
+            del self._jobs[job_id]
+
+    async def _worker(self, worker_id: int):
+        while True:
+            job_id, spool, vectorstore = await self._queue.get()
+            try:
+                await self._process(job_id, spool, vectorstore)
+            except Exception as e:
+                logger.error(f"Upload job {job_id} failed: {e}")
+                self._update(job_id, status="failed", error=str(e), finished_at=time.time())
+            finally:
+                spool.close()
+                self._queue.task_done()
+
+    async def _process(self, job_id: str, spool, vectorstore: VectorStore):
+        job = self._jobs[job_id]
+        job["status"] = "processing"
+
+        docs: List[Document] = []
+        chunk_index = 0
+        async for text in iter_text_chunks(lambda n: run_in_threadpool(spool.read, n)):
+            docs.append(
+                Document(
+                    page_content=text,
+                    metadata={
+                        "filename": job["filename"],
+                        "file_type": job["file_type"],
+                        "chunk_index": chunk_index,
+                    },
+                )
+            )
+            chunk_index += 1
+            if len(docs) >= UPLOAD_BATCH_SIZE:
+                job["document_ids"].extend(
+                    await aadd_batched(vectorstore, docs, skip_existing=True)
+                )
+                job["chunks_done"] = chunk_index
+                docs = []
+
+        # 单表存储
+        if docs:
+            job["document_ids"].extend(
+                await aadd_batched(vectorstore, docs, skip_existing=True)
+            )
+        job["chunks_done"] = chunk_index
+        job["status"] = "completed"
+        job["finished_at"] = time.time()
+        logger.info(f"Upload job {job_id} completed: {chunk_index} chunks")
+
+
+# 全局任务管理器
+upload_job_manager = UploadJobManager(num_workers=config.UPLOAD_WORKERS)
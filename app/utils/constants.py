@@ -15,5 +15,7 @@ class EventType(str, Enum):
     READY = "ready"
     UPDATE_SESSION = "update_session"
     MESSAGE = "message"
+    RETRIEVAL = "retrieval"
+    REASONING = "reasoning"
     FINISH = "finish"
     CLOSE = "close"
\ No newline at end of file
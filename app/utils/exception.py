@@ -1,7 +1,7 @@
 import traceback
 
 from fastapi import HTTPException, Request
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse
 from sqlalchemy.exc import IntegrityError, SQLAlchemyError
 from starlette import status
 
@@ -14,7 +14,7 @@ async def http_exception_handler(request: Request, exc: HTTPException):
     """
     处理HTTP异常
     """
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=exc.status_code,
         content={
             "code": exc.status_code,
@@ -39,7 +39,7 @@ async def integrity_error_handler(request: Request, exc: IntegrityError):
             "path": str(request.url)
         }
 
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=status.HTTP_400_BAD_REQUEST,
         content={
             "code": status.HTTP_400_BAD_REQUEST,
@@ -63,7 +63,7 @@ async def sqlalchemy_error_handler(request: Request, exc: SQLAlchemyError):
             "path": str(request.url)
         }
 
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
         content={
             "code": status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -87,7 +87,7 @@ async def general_exception_handler(request: Request, exc: Exception):
             "path": str(request.url)
         }
 
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
         content={
             "code": status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -1,5 +1,5 @@
 from typing import Any
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse
 from fastapi.encoders import jsonable_encoder
 
 
@@ -11,4 +11,4 @@ def success_response(message: str = "Success", data: Any = None):
     }
 
     # 目标：把任何 FastAPI、Pydantic、ORM 对象 都正常响应 -> code、message、data
-    return JSONResponse(content=jsonable_encoder(content))
+    return ORJSONResponse(content=jsonable_encoder(content))
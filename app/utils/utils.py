@@ -1,5 +1,6 @@
 import json
 from datetime import datetime, date
+from enum import Enum
 from uuid import UUID
 import uuid6
 
@@ -47,5 +48,8 @@ class SSEUtil:
         """辅助函数：将字典转换为 SSE 格式字符串"""
         msg = f"data: {json.dumps(data, cls=JSONEncoder)}\n"
         if event:
+            # str 枚举在 f-string 中会格式化为 "EventType.MESSAGE"，这里取其值
+            if isinstance(event, Enum):
+                event = event.value
             msg = f"event: {event}\n{msg}"
         return msg + "\n"
@@ -17,6 +17,8 @@ HOST = "0.0.0.0"
 PORT = 8000
 APP_MODULE = "app.main:app"
 LOG_FILE = "auto_run.log"
+# 事件循环：uvloop 不支持 Windows，其余平台显式使用 uvloop
+LOOP = "asyncio" if sys.platform == "win32" else "uvloop"
 
 # 添加当前目录到 PYTHONPATH
 PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
@@ -70,6 +72,7 @@ def start_server():
     print(f"   监听地址: http://{HOST}:{PORT}")
     print(f"   API 文档: http://{HOST}:{PORT}/docs")
     print(f"   日志文件: {LOG_FILE}")
+    print(f"   事件循环: {LOOP}")
     print("-" * 50)
     
     # 设置环境变量
@@ -82,6 +85,7 @@ def start_server():
         APP_MODULE,
         "--host", HOST,
         "--port", str(PORT),
+        "--loop", LOOP,
         "--reload"
     ]
     
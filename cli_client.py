@@ -45,6 +45,7 @@ sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 from app.services.chat_info import ChatMessageService
 from app.core.langchain import langchain_manager
+from app.services.embed_batcher import aadd_batched
 from app.core.db import async_db_manager, langchain_pool, db_initializer
 from app.crud.chat_info import chat_session_crud
 from app.services.ai.agent_graph import get_gal_agent
@@ -152,7 +153,7 @@ class CLIClient:
                 for idx, chunk in enumerate(chunks)
             ]
 
-            ids = await vectorstore.aadd_documents(docs)
+            ids = await aadd_batched(vectorstore, docs)
 
             self.safe_print(f"\n✅ Successfully processed: {os.path.basename(filepath)}")
             self.safe_print(f"   ✓ Chunks: {len(ids)}\n")